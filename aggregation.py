@@ -0,0 +1,140 @@
+"""CSC110 Fall 2020: aggregation
+
+Module Description
+==================
+This module contains the code to turn predicted impact percentages into absolute impacts (sq.
+km of land lost, people displaced) and to roll them up by region and for the world.
+
+The country totals (area, population) and regions come from the raw slr-impacts dataset (see
+dataset_processing.load_impacts). A RegionIndex lines them up with the countries of a
+prediction once, grouping the countries of each region together, so that aggregate turns the
+percentages of any number of scenarios into country, region and world totals with a
+multiplication and one segment sum (np.add.reduceat) over the grouped countries.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+from typing import List, NamedTuple
+
+import numpy as np
+
+import dataset_processing
+
+
+# sheets of the slr-impacts dataset holding the totals of land loss and population displacement
+LAND_SHEET = 'Land'
+POPULATION_SHEET = 'Population'
+
+
+class RegionIndex(NamedTuple):
+    """The totals and regions of the countries of a prediction, in the prediction's order.
+
+    <totals> holds each country's total (area in sq. km, population, ...), 0 for the countries
+    in <missing> (whose codes are not in the impacts dataset). <order> lists the countries
+    grouped by region, and the countries of region i (named <regions>[i]) are
+    order[starts[i]:starts[i + 1]].
+    """
+    codes: np.ndarray
+    totals: np.ndarray
+    regions: np.ndarray
+    order: np.ndarray
+    starts: np.ndarray
+    missing: List[str]
+
+
+class AbsoluteImpacts(NamedTuple):
+    """Absolute impacts of one or more scenarios (shape S, e.g. () or (scenarios,)).
+
+    <countries> has shape S + (countries,), in the order of <codes>, <regions> shape
+    S + (regions,), in the order of <region_names>, and <world> shape S.
+    """
+    countries: np.ndarray
+    regions: np.ndarray
+    world: np.ndarray
+    codes: np.ndarray
+    region_names: np.ndarray
+
+
+def region_index(table: dataset_processing.ImpactTable, codes: np.ndarray) -> RegionIndex:
+    """Return the index of the totals and regions in <table> of the countries <codes>.
+
+    Countries missing from <table> get a total of 0 and the region ''.
+
+    >>> table = dataset_processing.ImpactTable(
+    ...     np.array(['AAA', 'BBB', 'CCC']), np.array(['A', 'B', 'C']),
+    ...     np.array(['North', 'South', 'North']), np.array([10.0, 20.0, 30.0]),
+    ...     np.zeros((3, 5)), np.zeros((3, 5)))
+    >>> index = region_index(table, np.array(['CCC', 'BBB', 'AAA']))
+    >>> index.totals.tolist(), index.regions.tolist()
+    ([30.0, 20.0, 10.0], ['North', 'South'])
+    >>> index.order[index.starts[0]:index.starts[1]].tolist()
+    [0, 2]
+    """
+    positions = {code: i for i, code in enumerate(table.codes.tolist())}
+    rows = np.array([positions.get(code, -1) for code in np.asarray(codes).tolist()],
+                    dtype=np.intp)
+    found = rows >= 0
+
+    totals = np.where(found, table.totals[rows], 0.0)
+    country_regions = np.where(found, table.regions[rows], '')
+    regions, region_of = np.unique(country_regions, return_inverse=True)
+    order = np.argsort(region_of, kind='stable')
+    starts = np.searchsorted(region_of[order], np.arange(len(regions)))
+
+    return RegionIndex(np.asarray(codes), np.nan_to_num(totals), regions, order, starts,
+                       [str(code) for code in np.asarray(codes)[~found]])
+
+
+def impacts_index(filepath_impacts: str, sheet: str, codes: np.ndarray) -> RegionIndex:
+    """Return the region_index of <codes> in the <sheet> section of the slr-impacts dataset at
+    <filepath_impacts>.
+
+    Preconditions:
+      - sheet in dataset_processing.load_impacts(filepath_impacts)
+    """
+    return region_index(dataset_processing.load_impacts(filepath_impacts)[sheet], codes)
+
+
+def aggregate(index: RegionIndex, percentages: np.ndarray) -> AbsoluteImpacts:
+    """Return the absolute impacts of the impact percentages <percentages>, an array of shape
+    S + (countries,) (one scenario, or a grid of them) with countries in the order of
+    index.codes.
+
+    >>> table = dataset_processing.ImpactTable(
+    ...     np.array(['AAA', 'BBB', 'CCC']), np.array(['A', 'B', 'C']),
+    ...     np.array(['North', 'South', 'North']), np.array([10.0, 20.0, 30.0]),
+    ...     np.zeros((3, 5)), np.zeros((3, 5)))
+    >>> impacts = aggregate(region_index(table, table.codes), np.array([[50.0, 10.0, 10.0]]))
+    >>> impacts.regions.tolist(), impacts.world.tolist()
+    ([[8.0, 2.0]], [10.0])
+    """
+    percentages = np.asarray(percentages, dtype=float)
+    countries = percentages * (index.totals / 100)
+
+    flat = countries.reshape((-1, len(index.codes)))
+    if len(index.regions) > 0:
+        regions = np.add.reduceat(flat[:, index.order], index.starts, axis=1)
+    else:
+        regions = np.zeros((len(flat), 0))
+
+    return AbsoluteImpacts(countries,
+                           regions.reshape(percentages.shape[:-1] + (len(index.regions),)),
+                           countries.sum(axis=-1), index.codes, index.regions)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['typing', 'numpy', 'dataset_processing'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,150 @@
+"""CSC110 Fall 2020: Animation
+
+Module Description
+==================
+This module contains the code to create and display the animated bar
+graph shown when the start button is clicked in the main program.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+
+
+import datetime
+from typing import Any, List
+
+import numpy as np
+
+import instrumentation
+
+
+# most frames an animated graph is built with; longer trajectories are decimated
+MAX_FRAMES = 120
+
+# milliseconds each frame is shown for (and tweened to the next frame over)
+FRAME_DURATION = 500
+
+
+@instrumentation.timed('animation.display_animated_graph')
+def display_animated_graph(sea_level_points: List[float], points_per_year: int = 1) -> None:
+    """"
+    Function to display an animated bar graph to represent the rising sea level
+    <points_per_year> is the number of points per year of sea_level_points, e.g. 12 for the
+    monthly trajectory of prediction.monthly_sea_level_prediction.
+
+    Preconditions:
+        - len(sea_level_points) > 0
+        - points_per_year in {1, 2, 3, 4, 6, 12}
+    """
+    build_animated_graph(sea_level_points, points_per_year).show()
+
+
+@instrumentation.timed('animation.build_animated_graph')
+def build_animated_graph(sea_level_points: List[float], points_per_year: int = 1,
+                         max_frames: int = MAX_FRAMES) -> Any:
+    """
+    Return the plotly figure of the animated bar graph shown by display_animated_graph.
+
+    Long trajectories are decimated to at most <max_frames> evenly spaced frames (always
+    keeping the first and last point), and the browser tweens the bar between kept frames, so
+    the figure's size and playing time stay about the same however far out the target year is.
+
+    Preconditions:
+        - len(sea_level_points) > 0
+        - points_per_year in {1, 2, 3, 4, 6, 12}
+        - max_frames >= 2
+    """
+    import plotly.graph_objects as go
+
+    points = np.asarray(sea_level_points, dtype=float)
+    kept = frame_indices(len(points), max_frames)
+    labels = [period_label(int(i), points_per_year) for i in kept]
+    heights = np.round(points[kept], 3).tolist()
+
+    # every kept point is shown for FRAME_DURATION ms, during which the bar grows linearly to
+    # the next one, so skipped points are interpolated on the client
+    play = {'frame': {'duration': FRAME_DURATION, 'redraw': False}, 'mode': 'immediate',
+            'fromcurrent': True, 'transition': {'duration': FRAME_DURATION, 'easing': 'linear'}}
+    jump = {'frame': {'duration': 0, 'redraw': False}, 'mode': 'immediate',
+            'transition': {'duration': 0}}
+
+    fig = go.Figure(
+        data=[go.Bar(x=['World'], y=[heights[0]], name='World', marker_color='#636efa',
+                     showlegend=True,
+                     hovertemplate='Location=%{x}<br>Sea Level (mm)=%{y}<extra></extra>')],
+        frames=[go.Frame(data=[{'y': [height]}], traces=[0], name=label)
+                for label, height in zip(labels, heights)])
+
+    fig.update_layout(
+        xaxis_title='Location', yaxis_title='Sea Level (mm)', legend_title='Location',
+        yaxis_range=[0, points.max()], margin={'t': 60},
+        updatemenus=[{'type': 'buttons', 'direction': 'left', 'showactive': False,
+                      'x': 0.1, 'xanchor': 'right', 'y': 0, 'yanchor': 'top',
+                      'pad': {'r': 10, 't': 70},
+                      'buttons': [{'label': '&#9654;', 'method': 'animate', 'args': [None, play]},
+                                  {'label': '&#9724;', 'method': 'animate',
+                                   'args': [[None], jump]}]}],
+        sliders=[{'active': 0, 'currentvalue': {'prefix': 'Year='}, 'len': 0.9,
+                  'x': 0.1, 'xanchor': 'left', 'y': 0, 'yanchor': 'top',
+                  'pad': {'b': 10, 't': 60},
+                  'steps': [{'label': label, 'method': 'animate', 'args': [[label], jump]}
+                            for label in labels]}])
+    return fig
+
+
+def frame_indices(num_points: int, max_frames: int) -> np.ndarray:
+    """
+    Return the indices of the points of a trajectory of <num_points> points kept as animation
+    frames: all of them, or <max_frames> evenly spaced ones including the first and last.
+
+    >>> frame_indices(5, 10).tolist()
+    [0, 1, 2, 3, 4]
+    >>> frame_indices(487, 5).tolist()
+    [0, 122, 243, 364, 486]
+
+    Preconditions:
+        - num_points > 0
+        - max_frames >= 2
+    """
+    if num_points <= max_frames:
+        return np.arange(num_points)
+    else:
+        return np.linspace(0, num_points - 1, max_frames).round().astype(int)
+
+
+def period_label(index: int, points_per_year: int) -> str:
+    """
+    Return the label of the point at <index> of a trajectory starting in 2014 with
+    <points_per_year> points per year: the year, followed by the month when there are several
+    points per year.
+
+    >>> period_label(0, 1)
+    '2014'
+    >>> period_label(14, 12)
+    '2015-03'
+    """
+    year = datetime.date(2013, 1, 1).year + (1 + index // points_per_year)
+    if points_per_year == 1:
+        return str(year)
+    else:
+        month = (index % points_per_year) * (12 // points_per_year) + 1
+        return f'{year}-{month:02d}'
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['plotly.graph_objects', 'numpy', 'datetime', 'typing',
+                          'instrumentation'],
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,293 @@
+"""CSC110 Fall 2020: benchmark
+
+Module Description
+==================
+This module contains the benchmark suite of the prediction and rendering pipeline. It times
+the dataset parsers, the regressions, the national stats, the sea level prediction and the
+construction of every figure (without displaying them) on synthetic datasets scaled to a
+multiple of the real number of countries and years, and saves the timings as JSON.
+
+Run it with python benchmark.py [--scales 1 10 100] [-o results.json] [--baseline old.json];
+with a baseline, every benchmark that got slower by more than --threshold is flagged, and the
+exit status is 1 if any was. python benchmark.py python_ta checks this module with python_ta
+instead.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+import animation
+import dataset_processing
+import maps
+import prediction
+
+
+# countries and projected years of the real datasets, multiplied by each scale
+BASE_COUNTRIES = 84
+BASE_YEARS = 100
+
+# scales run by default (1000 is supported, but takes minutes)
+DEFAULT_SCALES = [1, 10, 100]
+
+# a benchmark is flagged when its median is this many times its baseline median
+DEFAULT_THRESHOLD = 1.25
+
+# seed of the synthetic datasets, so every run times the same data
+SEED = 110
+
+
+class SyntheticDatasets(NamedTuple):
+    """The paths of a set of synthetic datasets in the formats of the real ones, with the
+    number of countries they cover and the number of years to project them for.
+    """
+    sea_level: str
+    co2: str
+    land_loss: str
+    pop_displacement: str
+    country_to_code: str
+    countries: int
+    years: int
+
+
+def make_synthetic_datasets(directory: str, scale: int) -> SyntheticDatasets:
+    """Write synthetic datasets with <scale> times the countries of the real ones to
+    <directory>, and return their paths.
+
+    The co2 dataset gets a row per year for each of the countries of the impact datasets and
+    for the World, like the real per-country file.
+    The sea level history keeps its 134 annual rows, since the model is fitted on the years
+    1880 to 2013 only; longer horizons are covered by projecting <scale> times more years.
+    """
+    rng = np.random.default_rng(SEED + scale)
+    countries = BASE_COUNTRIES * scale
+    codes = [f'C{i:05d}' for i in range(countries)]
+    paths = [os.path.join(directory, name) for name in
+             ['sea_level.csv', 'co2.csv', 'land_loss.csv', 'pop_displacement.csv',
+              'country_to_code.csv']]
+
+    with open(paths[0], 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Time', 'GMSL', 'GMSL uncertainty'])
+        for i, year in enumerate(range(1880, 2014)):
+            writer.writerow([f'{year}-06-15', round(-160 + 1.2 * i + rng.normal(0, 5), 1),
+                             round(rng.uniform(5, 25), 1)])
+
+    with open(paths[1], 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Entity', 'Code', 'Year', 'Annual CO2 emissions'])
+        emissions = 1e7 * 1.025 ** np.arange(2014 - 1751)
+        for code in codes[:countries]:
+            writer.writerows([f'Country {code}', code, year, value]
+                             for year, value in zip(range(1751, 2014), emissions.tolist()))
+        writer.writerows(['World', dataset_processing.WORLD_CODE, year, countries * value]
+                         for year, value in zip(range(1751, 2014), emissions.tolist()))
+
+    for path in paths[2:4]:
+        # percentages that grow with each metre of sea level rise, like the real ones
+        percentages = np.cumsum(rng.exponential(2.0, size=(countries, 5)), axis=1).round(2)
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Code', 'Country', '1m', '2m', '3m', '4m', '5m'])
+            for code, row in zip(codes, percentages.tolist()):
+                writer.writerow([code, 'Country ' + code] + row)
+
+    with open(paths[4], 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['CODE', 'COUNTRY'])
+        writer.writerows([code, 'Country ' + code] for code in codes)
+
+    return SyntheticDatasets(*paths, countries, BASE_YEARS * scale)
+
+
+def time_function(function: Callable[[], Any], repeat: int,
+                  max_seconds: float = 2.0) -> Dict[str, Any]:
+    """Return the timings in seconds of calling <function> <repeat> times (fewer if the calls
+    take over <max_seconds> in total), after one warm-up call.
+    """
+    function()
+
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeat and (not timings or time.perf_counter() - started < max_seconds):
+        call_started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - call_started)
+
+    return {'rounds': len(timings), 'min': min(timings), 'median': statistics.median(timings),
+            'mean': statistics.fmean(timings), 'max': max(timings)}
+
+
+def pipeline_benchmarks(datasets: SyntheticDatasets) -> Dict[str, Callable[[], Any]]:
+    """Return the benchmarks of the pipeline on <datasets>, by name.
+
+    The process_* and read_* benchmarks parse their file from scratch every call (process_co2
+    times read_co2_emissions, as process_co2 itself returns the cached world totals); the others
+    run with the parsed datasets and fitted coefficient tables already cached, as in a running
+    GUI.
+    """
+    land_loss_data = dataset_processing.process_land_loss(datasets.land_loss)
+    x_list, y_list = prediction.sea_level_observations(datasets.sea_level, datasets.co2)
+    x_future = list(np.linspace(x_list[-1], x_list[-1] + 35000 * datasets.years,
+                                datasets.years))
+    total_co2 = 35000.0 * datasets.years
+    sea_level_points = prediction.sea_level_prediction(datasets.sea_level, datasets.co2,
+                                                       total_co2, False, datasets.years)
+    sea_level_rise = sea_level_points[-1] - sea_level_points[0]
+    land_loss = prediction.land_loss_national_stats(datasets.land_loss, sea_level_rise)
+    codes = prediction.land_loss_coefficients(datasets.land_loss).codes
+    country_index = dataset_processing.load_country_index(datasets.country_to_code)
+    scenario_matrix = np.outer(np.linspace(0.5, 1.5, 10), land_loss)
+    land_loss_table = prediction.land_loss_coefficients(datasets.land_loss)
+    land_loss_lookup = prediction.land_loss_lookup(datasets.land_loss)
+    grid_rises = np.linspace(0.0, 20000.0, 10000)
+
+    return {
+        'process_sea_level': lambda: dataset_processing.process_sea_level(datasets.sea_level),
+        'process_co2': lambda: dataset_processing.read_co2_emissions(datasets.co2),
+        'read_co2_emissions_per_country':
+            lambda: dataset_processing.read_co2_emissions(datasets.co2, per_country=True),
+        'process_land_loss': lambda: dataset_processing.process_land_loss(datasets.land_loss),
+        'process_pop_displacement':
+            lambda: dataset_processing.process_pop_displacement(datasets.pop_displacement),
+        'regression_points':
+            lambda: prediction.regression_points(list(x_list), list(y_list), x_future, 1),
+        'land_loss_prediction_loop':
+            lambda: [prediction.land_loss_prediction(land_loss_data, sea_level_rise, code)
+                     for code in land_loss_data],
+        'land_loss_national_stats':
+            lambda: prediction.land_loss_national_stats(datasets.land_loss, sea_level_rise),
+        'quadratic_curves_grid':
+            lambda: prediction.coefficient_table_grid(land_loss_table, grid_rises),
+        'bounded_curves_grid':
+            lambda: prediction.impact_lookup_grid(land_loss_lookup, grid_rises),
+        'sea_level_prediction':
+            lambda: prediction.sea_level_prediction(datasets.sea_level, datasets.co2,
+                                                    total_co2, False, datasets.years),
+        'build_animated_graph': lambda: animation.build_animated_graph(sea_level_points),
+        'build_map': lambda: maps.build_map(land_loss, codes, 'Land Lost', country_index),
+        'build_scenario_map':
+            lambda: maps.build_scenario_map(scenario_matrix, codes,
+                                            [str(i) for i in range(len(scenario_matrix))],
+                                            'Land Lost', country_index),
+        'serialize_map':
+            lambda: maps.build_map(land_loss, codes, 'Land Lost', country_index).to_json(),
+    }
+
+
+def run_benchmarks(scales: List[int], repeat: int,
+                   selected: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Run the benchmarks whose names contain one of <selected> (all of them by default) at
+    every scale of <scales>, and return the results in the JSON layout saved by this module.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in scales:
+            scale_directory = os.path.join(directory, f'x{scale}')
+            os.makedirs(scale_directory)
+            datasets = make_synthetic_datasets(scale_directory, scale)
+
+            for name, function in pipeline_benchmarks(datasets).items():
+                if selected and not any(pattern in name for pattern in selected):
+                    continue
+                key = f'x{scale}/{name}'
+                results[key] = time_function(function, repeat)
+                print(f'{key:<40} {results[key]["median"] * 1000:>12.3f} ms', file=sys.stderr)
+
+            dataset_processing.clear_dataset_store()
+
+    return {'machine': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'platform': platform.platform(), 'processor': platform.processor(),
+                        'cpus': os.cpu_count()},
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'scales': scales,
+            'results': results}
+
+
+def compare_results(results: Dict[str, Any], baseline: Dict[str, Any],
+                    threshold: float) -> List[str]:
+    """Return a line per benchmark present in both <results> and <baseline> comparing their
+    medians, with the benchmarks slower than <threshold> times the baseline flagged
+    'REGRESSION'.
+
+    >>> compare_results({'results': {'a': {'median': 3.0}}},
+    ...                 {'results': {'a': {'median': 2.0}}}, 1.25)
+    ['a: 2000.000 ms -> 3000.000 ms (1.50x) REGRESSION']
+    """
+    lines = []
+    for key, timing in results['results'].items():
+        if key in baseline['results']:
+            before = baseline['results'][key]['median']
+            ratio = timing['median'] / before if before > 0 else float('inf')
+            flag = ' REGRESSION' if ratio > threshold else ''
+            lines.append(f'{key}: {before * 1000:.3f} ms -> {timing["median"] * 1000:.3f} ms '
+                         f'({ratio:.2f}x){flag}')
+
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks as given by <argv> (sys.argv[1:] by default) and return the exit
+    status: 1 if a regression against the baseline was flagged, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the prediction and rendering '
+                                                 'pipeline on synthetic datasets.')
+    parser.add_argument('--scales', nargs='+', type=int, default=DEFAULT_SCALES,
+                        help='multiples of the real number of countries and years to run at')
+    parser.add_argument('--repeat', type=int, default=5, help='timed calls per benchmark')
+    parser.add_argument('-k', '--select', nargs='+', default=None,
+                        help='only run the benchmarks whose names contain one of these')
+    parser.add_argument('-o', '--output', default=None, help='JSON file to save results to')
+    parser.add_argument('--baseline', default=None, help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='slowdown (ratio of medians) flagged as a regression')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scales, args.repeat, args.select)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            lines = compare_results(results, json.load(file), args.threshold)
+        print('\n'.join(lines))
+        return 1 if any(line.endswith('REGRESSION') for line in lines) else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['python_ta']:
+        import python_ta
+
+        python_ta.check_all(config={
+            'extra-imports': ['argparse', 'csv', 'datetime', 'json', 'os', 'platform',
+                              'statistics', 'sys', 'tempfile', 'time', 'typing', 'numpy',
+                              'animation', 'dataset_processing', 'maps', 'prediction'],
+            'allowed-io': ['make_synthetic_datasets', 'run_benchmarks', 'main'],
+            'max-line-length': 100,
+            'disable': ['R1705', 'C0200']
+        })
+    else:
+        sys.exit(main())
@@ -2,10 +2,101 @@
 Copyright Info
 """
 
-from typing import Dict, List
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
 
 import csv
 import datetime
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+import instrumentation
+
+
+# name of the directory, next to each dataset, holding files derived from that dataset
+CACHE_DIRECTORY = '.slr_cache'
+
+# layout of a sea level series: the year and month of each measurement, with its Global Mean
+# Sea Level and uncertainty in mm (uncertainty is nan when the dataset has none)
+SEA_LEVEL_DTYPE = np.dtype([('year', '<i4'), ('month', '<i4'),
+                            ('gmsl', '<f8'), ('uncertainty', '<f8')])
+
+# (first, last) years, inclusive, of the co2 and sea level datasets the sea level regression is
+# fitted on; the datasets only share 1880 to 2013
+CO2_YEARS = (1880, 2013)
+SEA_LEVEL_YEARS = (1751, 2013)
+
+# rows of the co2 dataset parsed at a time, so the per-country file is never held in memory whole
+CO2_CHUNK_ROWS = 100000
+
+# code of the world totals rows of the co2 dataset; other codes starting with OWID_ are
+# aggregates (continents, income groups, ...) rather than countries, like the rows without a code
+WORLD_CODE = 'OWID_WRL'
+AGGREGATE_CODE_PREFIX = 'OWID_'
+
+# fields of Co2Emissions, as stored in the co2 cache file
+CO2_FIELDS = ['years', 'world', 'codes', 'names', 'countries']
+
+# mm per inch, for the EPA series, which is measured in inches
+MM_PER_INCH = 25.4
+
+# sheets of the slr-impacts workbook, in order; CSV exports of it hold their sections (each
+# starting with a Global row) in the same order
+IMPACT_SHEETS = ['Land', 'Population', 'GDP', 'Agriculture', 'UrbanExtent', 'Wetland']
+
+# fields of ImpactTable, as stored in the slr-impacts cache file
+IMPACT_FIELDS = ['codes', 'names', 'regions', 'totals', 'absolute', 'percent']
+
+
+class ImpactTable(NamedTuple):
+    """One section (sheet) of the slr-impacts dataset, with a row per country.
+
+    <codes>, <names> and <regions> are the ISO3 code, name and region (the heading row above it
+    in the dataset) of every country, and <totals> its total area (in sq. km), population, GDP,
+    etc. <absolute> and <percent> are (countries x 5) arrays of the amount and percentage of
+    that total impacted under 1m, 2m, ..., 5m of sea level rise.
+    """
+    codes: np.ndarray
+    names: np.ndarray
+    regions: np.ndarray
+    totals: np.ndarray
+    absolute: np.ndarray
+    percent: np.ndarray
+
+
+class Co2Emissions(NamedTuple):
+    """The co2 emissions dataset, by year.
+
+    <world> holds the world's total emissions (in metric tonnes) of every year of <years>. If
+    the per-country series were kept, <countries> is a (countries x years) array of the
+    emissions of the country with the ISO3 code and name <codes>[i] and <names>[i] in row i
+    (nan for the years it has no data); otherwise it has no rows.
+    """
+    years: np.ndarray
+    world: np.ndarray
+    codes: np.ndarray
+    names: np.ndarray
+    countries: np.ndarray
+
+
+class CountryIndex(NamedTuple):
+    """The countries of the country-to-code dataset, identified by their row position.
+
+    <codes> and <names> hold the ISO3 code and name of the country of every row, and
+    <code_positions> and <name_positions> map each code and name back to its row.
+    """
+    codes: List[str]
+    names: List[str]
+    code_positions: Dict[str, int]
+    name_positions: Dict[str, int]
+
+
+# mapping from (absolute filepath, loader name, *loader arguments) to
+# ((mtime, size), parsed dataset)
+_DATASET_STORE: Dict[Tuple[str, str], Tuple[Tuple[int, int], Any]] = {}
 
 
 def str_to_date_sea_level(date_string: str) -> datetime.date:
@@ -25,11 +116,13 @@ def str_to_date_sea_level(date_string: str) -> datetime.date:
     return date
 
 
-def process_sea_level(filepath: str) -> Dict[datetime.date, float]:
+@instrumentation.timed('dataset_processing.process_sea_level')
+def process_sea_level(filepath: str,
+                      years: Tuple[int, int] = SEA_LEVEL_YEARS) -> Dict[datetime.date, float]:
     """Transform the dataset into a usable format.
 
     Return a mapping with the keys being the year, and the value being the Global Mean Sea Level
-    of that year.
+    of that year, for the years from years[0] to years[1] inclusive.
 
     filepath is 'csiro_recons_gmsl_yr_2015_csv.csv', if the dataset is in the root folder
     (Same as this py file)
@@ -48,31 +141,218 @@ def process_sea_level(filepath: str) -> Dict[datetime.date, float]:
             # row[2] = GMSL Uncertainty as str
             str_date = row[0]
             date = str_to_date_sea_level(str_date)
-            if 1751 <= date.year <= 2013:
+            if years[0] <= date.year <= years[1]:
                 sea_level = float(row[1])
                 mapping[str_to_date_sea_level(str_date)] = sea_level
 
     return mapping
 
 
-def process_co2(filepath: str) -> Dict[datetime.date, float]:
+@instrumentation.timed('dataset_processing.parse_sea_level_series')
+def parse_sea_level_series(filepath: str) -> np.ndarray:
+    """Return the sea level series in the CSV or JSON dataset at <filepath> as an array of
+    SEA_LEVEL_DTYPE, in the order of the dataset.
+
+    Both the CSIRO datasets (Time, GMSL[, GMSL uncertainty], in mm) and the EPA dataset
+    (Year, CSIRO Adjusted Sea Level, Lower Error Bound, Upper Error Bound, in inches) are
+    understood; the EPA series is converted to mm, with half its error band as uncertainty.
+    Rows without a sea level measurement are skipped.
+    """
+    if filepath.endswith('.json'):
+        with open(filepath) as file:
+            records = json.load(file)
+        columns = list(records[0]) if records else []
+        rows = [[record[column] for column in columns] for record in records]
+    else:
+        with open(filepath) as file:
+            reader = csv.reader(file)
+            columns = next(reader)
+            rows = list(reader)
+
+    # skip incomplete rows, such as the EPA's last year, which only has a NOAA measurement
+    if 'CSIRO Adjusted Sea Level' in columns:
+        value_column = columns.index('CSIRO Adjusted Sea Level')
+    else:
+        value_column = columns.index('GMSL')
+    rows = [row for row in rows
+            if len(row) == len(columns) and row[value_column] not in ('', None)]
+
+    if 'CSIRO Adjusted Sea Level' in columns:
+        dates = [row[columns.index('Year')] for row in rows]
+        gmsl = [row[columns.index('CSIRO Adjusted Sea Level')] for row in rows]
+        lower = np.array([row[columns.index('Lower Error Bound')] for row in rows], dtype=float)
+        upper = np.array([row[columns.index('Upper Error Bound')] for row in rows], dtype=float)
+        scale = MM_PER_INCH
+        uncertainty = (upper - lower) / 2
+    else:
+        dates = [row[columns.index('Time')] for row in rows]
+        gmsl = [row[columns.index('GMSL')] for row in rows]
+        scale = 1.0
+        if 'GMSL uncertainty' in columns:
+            uncertainty = np.array([row[columns.index('GMSL uncertainty')] for row in rows],
+                                   dtype=float)
+        else:
+            uncertainty = np.full(len(rows), np.nan)
+
+    series = np.empty(len(rows), dtype=SEA_LEVEL_DTYPE)
+    series['year'] = [int(date[0:4]) for date in dates]
+    series['month'] = [int(date[5:7]) if len(date) >= 7 else 1 for date in dates]
+    series['gmsl'] = np.array(gmsl, dtype=float) * scale
+    series['uncertainty'] = uncertainty * scale
+
+    return series
+
+
+def sea_level_series(filepath: str) -> np.ndarray:
+    """Return the sea level series in the dataset at <filepath> as a read-only memory-mapped
+    array of SEA_LEVEL_DTYPE.
+
+    The dataset is parsed with parse_sea_level_series only when its .npy file in the cache
+    directory is missing or was made from another version of the dataset (as told by the
+    file_signature saved beside it); otherwise the .npy file is mapped directly.
+    """
+    series_path = cache_path(filepath, '_series.npy')
+    signature_path = cache_path(filepath, '_series_signature.json')
+    signature = list(file_signature(filepath))
+
+    if not os.path.exists(series_path) or stored_signature(signature_path) != signature:
+        series = parse_sea_level_series(filepath)
+        atomic_write(series_path, lambda file: np.save(file, series))
+        # written after the series, so a matching signature always comes with a current series
+        atomic_write(signature_path, lambda file: file.write(json.dumps(signature).encode()))
+
+    return np.load(series_path, mmap_mode='r')
+
+
+@instrumentation.timed('dataset_processing.process_co2')
+def process_co2(filepath: str,
+                years: Tuple[int, int] = CO2_YEARS) -> Dict[datetime.date, float]:
     """
     'Project Datasets/annual-co2-emissions-per-country_1.csv'
-    Return a mapping from a year to that year's total co2 emissions.
+    Return a mapping from a year to that year's total co2 emissions, for the years from
+    years[0] to years[1] inclusive.
+
+    The total of a year is the sum of its country rows (see read_co2_emissions).
     """
+    emissions = co2_emissions(filepath)
     dataset_dict = {}
 
-    with open(filepath) as file:
-        reader = csv.reader(file)
-        next(reader)
-        for row in reader:
-            date = datetime.date(int(row[2][0:4]), 1, 1)
-            if 1880 <= date.year <= 2013:
-                dataset_dict[date] = float(row[3])
+    for year, total in zip(emissions.years.tolist(), emissions.world.tolist()):
+        if years[0] <= year <= years[1]:
+            dataset_dict[datetime.date(year, 1, 1)] = total
 
     return dataset_dict
 
 
+def is_country_code(code: str) -> bool:
+    """Return whether the co2 dataset rows with the code <code> are those of a country, rather
+    than of the world or another aggregate.
+
+    >>> [is_country_code(code) for code in ['GBR', 'OWID_WRL', 'OWID_KUW', '']]
+    [True, False, False, False]
+    """
+    return code != '' and not code.startswith(AGGREGATE_CODE_PREFIX)
+
+
+@instrumentation.timed('dataset_processing.read_co2_emissions')
+def read_co2_emissions(filepath: str, per_country: bool = False,
+                       chunk_rows: int = CO2_CHUNK_ROWS) -> Co2Emissions:
+    """Return the co2 emissions in the Entity,Code,Year,Annual CO2 emissions dataset at
+    <filepath>, read <chunk_rows> rows at a time, with the per-country series if
+    <per_country> is True.
+
+    The world total of a year is the sum of its country rows (rows of the world and of other
+    aggregates are not counted twice), or its World row for the years without country rows,
+    such as in datasets of world totals only. Rows without emissions are skipped.
+
+    Preconditions:
+      - chunk_rows >= 1
+
+    >>> emissions = read_co2_emissions('Data/data/annual-co2-emissions-per-country_sample.csv',
+    ...                                per_country=True, chunk_rows=100)
+    >>> emissions.codes.tolist(), emissions.countries.shape
+    (['BRA', 'CHN', 'DEU', 'GBR', 'IND', 'USA'], (6, 263))
+    >>> bool(np.allclose(np.nansum(emissions.countries, axis=0), emissions.world, rtol=1e-12))
+    True
+    """
+    import pandas as pd
+
+    country_sums = pd.Series(dtype=float)
+    world_rows = []
+    country_frames = []
+
+    with pd.read_csv(filepath, header=0, names=['entity', 'code', 'year', 'co2'],
+                     usecols=[0, 1, 2, 3], dtype={'entity': str, 'code': str, 'year': str},
+                     keep_default_na=False, na_values={'co2': ['']},
+                     float_precision='round_trip', chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            chunk = chunk[chunk['co2'].notna()]
+            chunk_years = chunk['year'].str[0:4].astype(np.int64)
+            countries = ((chunk['code'] != '')
+                         & ~chunk['code'].str.startswith(AGGREGATE_CODE_PREFIX))
+            world = chunk['code'] == WORLD_CODE
+
+            country_sums = country_sums.add(
+                chunk['co2'][countries].groupby(chunk_years[countries]).sum(), fill_value=0.0)
+            world_rows.append(pd.Series(chunk['co2'][world].to_numpy(),
+                                        index=chunk_years[world].to_numpy()))
+            if per_country:
+                country_frames.append(pd.DataFrame({'entity': chunk['entity'][countries],
+                                                    'code': chunk['code'][countries],
+                                                    'year': chunk_years[countries],
+                                                    'co2': chunk['co2'][countries]}))
+
+    world_totals = pd.concat(world_rows) if world_rows else pd.Series(dtype=float)
+    # the last row of a year gives the world total, as for the country rows of a year
+    world_totals = world_totals[~world_totals.index.duplicated(keep='last')]
+    totals = country_sums.combine_first(world_totals).sort_index()
+    years = totals.index.to_numpy(dtype=np.int64)
+
+    if country_frames:
+        frame = pd.concat(country_frames)
+        codes, rows = np.unique(frame['code'].to_numpy(dtype=str), return_inverse=True)
+        names = frame.groupby('code', sort=True)['entity'].first().to_numpy(dtype=str)
+        countries = np.full((len(codes), len(years)), np.nan)
+        countries[rows, np.searchsorted(years, frame['year'].to_numpy())] = frame['co2']
+    else:
+        codes, names = np.array([], dtype=str), np.array([], dtype=str)
+        countries = np.zeros((0, len(years)))
+
+    return Co2Emissions(years, totals.to_numpy(dtype=float), codes, names, countries)
+
+
+def co2_emissions(filepath: str, per_country: bool = False) -> Co2Emissions:
+    """Return read_co2_emissions(filepath, per_country), read from its .npz file in the cache
+    directory.
+
+    The dataset is read only when the .npz file is missing or was made from another version
+    of the dataset.
+
+    >>> path = 'Data/data/annual-co2-emissions-per-country_sample.csv'
+    >>> emissions = co2_emissions(path, per_country=True)
+    >>> all(np.array_equal(cached, read, equal_nan=read.dtype.kind == 'f') for cached, read
+    ...     in zip(co2_emissions(path, per_country=True), read_co2_emissions(path, True)))
+    True
+    >>> sorted(process_co2(path).items())[-1]
+    (datetime.date(2013, 1, 1), 16854602118.400002)
+    """
+    emissions_path = cache_path(filepath, '_country_emissions.npz' if per_country
+                                else '_emissions.npz')
+    signature = np.array(file_signature(filepath), dtype=np.int64)
+
+    if os.path.exists(emissions_path):
+        with np.load(emissions_path, allow_pickle=False) as arrays:
+            if np.array_equal(arrays['signature'], signature):
+                return Co2Emissions(*(arrays[field] for field in CO2_FIELDS))
+
+    emissions = read_co2_emissions(filepath, per_country)
+    atomic_write(emissions_path,
+                 lambda file: np.savez(file, signature=signature, **emissions._asdict()))
+
+    return emissions
+
+
+@instrumentation.timed('dataset_processing.process_land_loss')
 def process_land_loss(filepath: str) -> Dict[str, List[float]]:
     """
     'Project Datasets/land_loss.csv'
@@ -90,6 +370,7 @@ def process_land_loss(filepath: str) -> Dict[str, List[float]]:
     return dataset_dict
 
 
+@instrumentation.timed('dataset_processing.process_pop_displacement')
 def process_pop_displacement(filepath: str) -> Dict[str, List[float]]:
     """
     'Project Datasets/pop_displacement.csv'
@@ -107,12 +388,293 @@ def process_pop_displacement(filepath: str) -> Dict[str, List[float]]:
     return dataset_dict
 
 
+def parse_impact_rows(rows: Iterable[List[Any]]) -> List[ImpactTable]:
+    """Return the sections of the slr-impacts rows <rows>, in order, reading them in one pass.
+
+    A section starts at its Global row (named in the name column, or in the first column in
+    summary exports without a code column); the heading and blank rows before it are skipped.
+    Region rows (a name and figures, but no code) set the region of the countries below them.
+    Figures may be numbers or strings with thousands separators.
+    """
+    sections = []
+    region = ''
+    countries = None
+
+    for row in rows:
+        cells = [str(cell).strip() if cell is not None else '' for cell in row]
+        cells += [''] * (13 - len(cells))
+        if cells[1] == 'Global' or cells[0] == 'Global':
+            countries = []
+            sections.append(countries)
+            region = ''
+        elif countries is None or not cells[1] or not cells[2]:
+            continue
+        elif not cells[0]:
+            region = cells[1]
+        else:
+            countries.append((cells[0], cells[1], region,
+                              [float(cell.replace(',', '')) if cell else np.nan
+                               for cell in cells[2:13]]))
+
+    tables = []
+    for countries in sections:
+        figures = np.array([country[3] for country in countries], dtype=float).reshape(-1, 11)
+        tables.append(ImpactTable(np.array([country[0] for country in countries], dtype=str),
+                                  np.array([country[1] for country in countries], dtype=str),
+                                  np.array([country[2] for country in countries], dtype=str),
+                                  figures[:, 0], figures[:, 1:6], figures[:, 6:11]))
+
+    return tables
+
+
+@instrumentation.timed('dataset_processing.process_impacts')
+def process_impacts(filepath: str) -> Dict[str, ImpactTable]:
+    """
+    'Data/data/slr-impacts_nov2010.xls'
+    Return a mapping from sheet name (see IMPACT_SHEETS) to the table of that sheet of the
+    slr-impacts workbook at <filepath>, or of the sections of a CSV export of it.
+
+    Reading the .xls workbook needs the xlrd package. Raise ValueError if the dataset has no
+    country rows, such as exports of its Global totals only.
+    """
+    if filepath.endswith('.xls'):
+        try:
+            import xlrd
+        except ImportError:
+            raise ImportError('reading .xls workbooks needs xlrd (pip install xlrd), or export '
+                              'the workbook to CSV') from None
+
+        workbook = xlrd.open_workbook(filepath, on_demand=True)
+        tables = {}
+        for name in workbook.sheet_names():
+            sheet = workbook.sheet_by_name(name)
+            sections = parse_impact_rows(sheet.row_values(i) for i in range(sheet.nrows))
+            if sections:
+                tables[name] = sections[0]
+            workbook.unload_sheet(name)
+    else:
+        with open(filepath, newline='') as file:
+            tables = dict(zip(IMPACT_SHEETS, parse_impact_rows(csv.reader(file))))
+
+    if not any(len(table.codes) > 0 for table in tables.values()):
+        raise ValueError(f'{filepath} has no country rows; give the slr-impacts workbook or a '
+                         f'CSV export of its sheets')
+
+    return tables
+
+
+def impact_tables(filepath: str) -> Dict[str, ImpactTable]:
+    """Return process_impacts(filepath), read from its .npz file in the cache directory.
+
+    The dataset is parsed only when the .npz file is missing or was made from another version
+    of the dataset (as told by the file_signature saved in it).
+    """
+    tables_path = cache_path(filepath, '_impacts.npz')
+    signature = np.array(file_signature(filepath), dtype=np.int64)
+
+    if os.path.exists(tables_path):
+        with np.load(tables_path, allow_pickle=False) as arrays:
+            if 'signature' in arrays.files and np.array_equal(arrays['signature'], signature):
+                names = list(dict.fromkeys(key.partition('.')[0] for key in arrays.files
+                                           if key != 'signature'))
+                return {name: ImpactTable(*(arrays[name + '.' + field]
+                                            for field in IMPACT_FIELDS))
+                        for name in names}
+
+    tables = process_impacts(filepath)
+    arrays = {'signature': signature}
+    for name, table in tables.items():
+        for field, array in zip(IMPACT_FIELDS, table):
+            arrays[name + '.' + field] = array
+    atomic_write(tables_path, lambda file: np.savez(file, **arrays))
+
+    return tables
+
+
+def write_impact_percentages(table: ImpactTable, filepath: str) -> None:
+    """Write the percentages of <table> to <filepath> in the Code,Country,1m,...,5m format
+    read by process_land_loss and process_pop_displacement.
+    """
+    with open(filepath, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Code', 'Country', '1m', '2m', '3m', '4m', '5m'])
+        for code, name, percent in zip(table.codes, table.names, table.percent.tolist()):
+            writer.writerow([code, name] + [round(value, 6) for value in percent])
+
+
+@instrumentation.timed('dataset_processing.process_country_index')
+def process_country_index(filepath: str) -> CountryIndex:
+    """
+    'Project Datasets/Country_to_Code.csv'
+    Return the index of the countries listed (CODE,COUNTRY) in the dataset at <filepath>.
+    """
+    codes = []
+    names = []
+    with open(filepath) as file:
+        reader = csv.reader(file)
+        next(reader)
+        for row in reader:
+            if len(row) >= 2 and row[0]:
+                codes.append(row[0])
+                names.append(row[1])
+
+    return CountryIndex(codes, names, {code: i for i, code in enumerate(codes)},
+                        {name: i for i, name in enumerate(names)})
+
+
+def country_positions(index: CountryIndex, codes: List[str]) -> np.ndarray:
+    """Return the row of each of <codes> in <index>, or -1 for codes that are not in it.
+
+    >>> index = CountryIndex(['ARG', 'BHS'], ['Argentina', 'Bahamas'], {'ARG': 0, 'BHS': 1},
+    ...                      {'Argentina': 0, 'Bahamas': 1})
+    >>> country_positions(index, ['BHS', 'XXX', 'ARG']).tolist()
+    [1, -1, 0]
+    """
+    return np.array([index.code_positions.get(code, -1) for code in codes], dtype=np.intp)
+
+
+def load_dataset(filepath: str, loader: Callable[..., Any], *args: Any) -> Any:
+    """Return the dataset at <filepath> parsed by loader(filepath, *args), parsing the file at
+    most once.
+
+    Parsed datasets are kept in an in-process store keyed on the file path, its modification
+    time and its size, so repeated calls for an unchanged file return the same object without
+    re-opening it. Editing or replacing the file invalidates its entry.
+
+    The returned object is shared between callers and must not be mutated.
+    """
+    key = (os.path.abspath(filepath), loader.__name__) + args
+    signature = file_signature(filepath)
+
+    entry = _DATASET_STORE.get(key)
+    if entry is None or entry[0] != signature:
+        entry = (signature, loader(filepath, *args))
+        _DATASET_STORE[key] = entry
+
+    return entry[1]
+
+
+def file_signature(filepath: str) -> Tuple[int, int]:
+    """Return the (modification time in ns, size in bytes) of the file at <filepath>, which
+    changes whenever the file is edited or replaced.
+    """
+    stat = os.stat(filepath)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def stored_signature(filepath: str) -> Optional[List[int]]:
+    """Return the file_signature saved as JSON in the file at <filepath>, or None if there is
+    no such file or it cannot be read.
+    """
+    try:
+        with open(filepath) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def clear_dataset_store() -> None:
+    """Drop every dataset held in the in-process store."""
+    _DATASET_STORE.clear()
+
+
+def load_sea_level(filepath: str,
+                   years: Tuple[int, int] = SEA_LEVEL_YEARS) -> Dict[datetime.date, float]:
+    """Return process_sea_level(filepath, years), parsed at most once per version of the file."""
+    return load_dataset(filepath, process_sea_level, years)
+
+
+def load_sea_level_series(filepath: str) -> np.ndarray:
+    """Return sea_level_series(filepath), mapped at most once per version of the file."""
+    return load_dataset(filepath, sea_level_series)
+
+
+def load_co2(filepath: str, years: Tuple[int, int] = CO2_YEARS) -> Dict[datetime.date, float]:
+    """Return process_co2(filepath, years), parsed at most once per version of the file."""
+    return load_dataset(filepath, process_co2, years)
+
+
+def load_co2_emissions(filepath: str, per_country: bool = False) -> Co2Emissions:
+    """Return co2_emissions(filepath, per_country), loaded at most once per version of the
+    file.
+    """
+    return load_dataset(filepath, co2_emissions, per_country)
+
+
+def load_land_loss(filepath: str) -> Dict[str, List[float]]:
+    """Return process_land_loss(filepath), parsed at most once per version of the file."""
+    return load_dataset(filepath, process_land_loss)
+
+
+def load_pop_displacement(filepath: str) -> Dict[str, List[float]]:
+    """Return process_pop_displacement(filepath), parsed at most once per version of the file."""
+    return load_dataset(filepath, process_pop_displacement)
+
+
+def load_country_index(filepath: str) -> CountryIndex:
+    """Return process_country_index(filepath), parsed at most once per version of the file."""
+    return load_dataset(filepath, process_country_index)
+
+
+def load_impacts(filepath: str) -> Dict[str, ImpactTable]:
+    """Return impact_tables(filepath), loaded at most once per version of the file."""
+    return load_dataset(filepath, impact_tables)
+
+
+def cache_path(filepath: str, suffix: str) -> str:
+    """Return the path of the file derived from the dataset at <filepath> ending in <suffix>.
+
+    Derived files live in a CACHE_DIRECTORY folder beside the dataset, which is created if needed.
+
+    >>> cache_path('Project Datasets/land_loss.csv', '_coefficients.npz').endswith(
+    ...     os.path.join('.slr_cache', 'land_loss_coefficients.npz'))
+    True
+    """
+    directory = os.path.join(os.path.dirname(os.path.abspath(filepath)), CACHE_DIRECTORY)
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+
+    return os.path.join(directory, stem + suffix)
+
+
+def atomic_write(filepath: str, write: Callable[[BinaryIO], Any]) -> None:
+    """Write the file at <filepath> with write(file), where file is a new binary file, and
+    replace <filepath> with it in one step.
+
+    The new file gets a unique temporary name in the same directory, so other threads and
+    processes writing the same file at once never clash, and readers never see a partly
+    written file.
+    """
+    descriptor, temporary_path = tempfile.mkstemp(suffix='.tmp',
+                                                  dir=os.path.dirname(os.path.abspath(filepath)))
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            write(file)
+        os.replace(temporary_path, filepath)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def file_digest(filepath: str) -> str:
+    """Return the SHA-256 hex digest of the contents of the file at <filepath>."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 16), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['tkinter', 'numpy', 'plotly', 'sklearn',
-                          'Animation', 'GUI', 'prediction', 'Map'],  # the names (strs) of imported modules
+        # the names (strs) of imported modules
+        'extra-imports': ['tkinter', 'numpy', 'pandas', 'plotly', 'sklearn', 'os', 'hashlib',
+                          'json', 'tempfile', 'xlrd', 'animation', 'GUI', 'prediction', 'maps',
+                          'instrumentation'],
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 100,
         'disable': ['R1705', 'C0200']
@@ -0,0 +1,93 @@
+"""CSC110 Fall 2020: impact_curves_test
+
+Module Description
+==================
+This module contains the tests of the country impact curves of the prediction module: the
+coefficient tables of the quadratic fits, stored beside each dataset, and the bounded curves.
+Run them with python -m pytest impact_curves_test.py.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+import os
+from typing import Any
+
+import numpy as np
+
+import dataset_processing
+import prediction
+
+
+# impact percentages at 1m to 5m of sea level rise, as in the land loss dataset
+IMPACT_DATA = {'ARG': [0.12, 0.25, 0.4, 0.56, 0.73],
+               'BHS': [5.06, 11.3, 19.1, 26.0, 32.3],
+               'MDV': [40.0, 90.0, 130.0, 120.0, 150.0],
+               'XXX': [3.0, 2.0, 2.5, 1.0, 4.0]}
+
+
+def test_bounded_curves_are_capped_and_monotone() -> None:
+    """Test that the bounded curves never leave 0% to 100% and never decrease, including past
+    5m and past the end of the lookup table.
+    """
+    lookup = prediction.build_impact_lookup(IMPACT_DATA)
+    rises = np.linspace(-1000.0, prediction.LOOKUP_MAX_SEA_LEVEL * 1.5, 20001)
+    impact_points = prediction.impact_lookup_grid(lookup, rises)
+
+    assert impact_points.shape == (len(rises), len(IMPACT_DATA))
+    assert np.all(impact_points >= 0.0)
+    assert np.all(impact_points <= prediction.MAX_IMPACT_PERCENTAGE)
+    assert np.all(np.diff(impact_points, axis=0) >= 0.0)
+    # past 5m each curve continues along its last segment until it reaches the cap
+    assert np.allclose(impact_points[-1], [16.88, 100.0, 100.0, 99.0])
+
+    at_knots = prediction.impact_lookup_grid(lookup, np.array(prediction.IMPACT_SEA_LEVELS,
+                                                              dtype=float))
+    assert np.allclose(at_knots.T, [[0.12, 0.25, 0.4, 0.56, 0.73],
+                                    [5.06, 11.3, 19.1, 26.0, 32.3],
+                                    [40.0, 90.0, 100.0, 100.0, 100.0],
+                                    [3.0, 3.0, 3.0, 3.0, 4.0]])
+
+
+def test_coefficient_table_rebuilt_when_digest_changes(tmp_path: Any) -> None:
+    """Test that the stored coefficient table of a dataset is reused while the dataset's
+    contents are unchanged, and rebuilt once they change, even if its size and modification
+    time are not.
+    """
+    filepath = os.path.join(str(tmp_path), 'land_loss.csv')
+    with open(filepath, 'w') as file:
+        file.write('Code,Country,1m,2m,3m,4m,5m\nARG,Argentina,0.12,0.25,0.4,0.56,0.73\n')
+    stat = os.stat(filepath)
+    table_path = dataset_processing.cache_path(filepath, '_coefficients.npz')
+
+    built = prediction.load_coefficient_table(filepath, dataset_processing.process_land_loss)
+    stored_mtime = os.stat(table_path).st_mtime_ns
+    loaded = prediction.load_coefficient_table(filepath, dataset_processing.process_land_loss)
+    assert os.stat(table_path).st_mtime_ns == stored_mtime
+    assert np.array_equal(loaded.coefficients, built.coefficients)
+    assert loaded.source_hash == built.source_hash == dataset_processing.file_digest(filepath)
+
+    with open(filepath, 'w') as file:
+        file.write('Code,Country,1m,2m,3m,4m,5m\nARG,Argentina,0.12,0.25,0.4,0.56,0.99\n')
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    rebuilt = prediction.load_coefficient_table(filepath, dataset_processing.process_land_loss)
+    assert rebuilt.source_hash == dataset_processing.file_digest(filepath) != built.source_hash
+    assert np.allclose(prediction.coefficient_table_points(rebuilt, 5000.0), [0.99], atol=0.1)
+    assert not np.allclose(rebuilt.coefficients, built.coefficients)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'typing', 'numpy', 'dataset_processing', 'prediction'],
+        'allowed-io': ['test_coefficient_table_rebuilt_when_digest_changes'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
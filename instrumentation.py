@@ -0,0 +1,185 @@
+"""CSC110 Fall 2020: instrumentation
+
+Module Description
+==================
+This module contains the timers used to find out where the time of a scenario goes: parsing
+datasets, fitting regressions, computing national stats or building figures. Functions are
+timed with the @timed decorator and blocks of code with the span context manager; each timed
+call is recorded under a stage name.
+
+Recording is off by default, and then a timed function costs one extra call and a flag check.
+Turn it on with enable() (or the SLR_INSTRUMENT environment variable), then read the per-stage
+counts and latencies with stage_stats() or summary(), or dump them with dump_json() or, for
+viewing as a flamegraph in chrome://tracing or Perfetto, dump_chrome_trace().
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Tuple
+
+
+# most timed calls kept for the Chrome trace; older ones are dropped (stage stats keep counting)
+MAX_EVENTS = 100000
+
+# whether timed calls are recorded
+_enabled = os.environ.get('SLR_INSTRUMENT', '') not in ('', '0')
+
+# mapping from stage name to [count, total seconds, min seconds, max seconds]
+_stages: Dict[str, List[float]] = {}
+
+# (stage name, start in ns, duration in ns, thread id) of the latest timed calls
+_events: Deque[Tuple[str, int, int, int]] = deque(maxlen=MAX_EVENTS)
+
+_lock = threading.Lock()
+
+
+def enable() -> None:
+    """Start recording timed calls."""
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    """Stop recording timed calls; what was recorded so far is kept."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    """Return whether timed calls are being recorded."""
+    return _enabled
+
+
+def reset() -> None:
+    """Forget every recorded call."""
+    with _lock:
+        _stages.clear()
+        _events.clear()
+
+
+def record(stage: str, started: int, duration: int) -> None:
+    """Record a call of <stage> that started at <started> and took <duration> (both in ns, from
+    time.perf_counter_ns).
+    """
+    seconds = duration / 1e9
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            _stages[stage] = [1, seconds, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = min(stats[2], seconds)
+            stats[3] = max(stats[3], seconds)
+        _events.append((stage, started, duration, threading.get_ident()))
+
+
+@contextlib.contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the body of a with statement as a call of <stage>, if recording is enabled."""
+    if not _enabled:
+        yield
+        return
+
+    started = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        record(stage, started, time.perf_counter_ns() - started)
+
+
+def timed(stage: str) -> Callable[[Callable], Callable]:
+    """Return a decorator timing every call of the decorated function as a call of <stage>.
+
+    >>> @timed('example.square')
+    ... def square(x: int) -> int:
+    ...     return x * x
+    >>> square(3)
+    9
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _enabled:
+                return function(*args, **kwargs)
+
+            started = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(stage, started, time.perf_counter_ns() - started)
+
+        return wrapper
+
+    return decorator
+
+
+def stage_stats() -> Dict[str, Dict[str, float]]:
+    """Return the number of calls and the total, mean, min and max seconds of every stage."""
+    with _lock:
+        return {stage: {'count': int(count), 'total': total, 'mean': total / count,
+                        'min': minimum, 'max': maximum}
+                for stage, (count, total, minimum, maximum) in _stages.items()}
+
+
+def summary() -> str:
+    """Return a table of the stats of every stage, slowest (in total) first."""
+    stats = stage_stats()
+    if not stats:
+        return 'No timed calls recorded' + ('' if _enabled else ' (instrumentation is off)')
+
+    lines = [f'{"calls":>7} | {"total [ms]":>11} | {"mean [ms]":>10} | {"max [ms]":>10} | stage']
+    for stage, stage_stat in sorted(stats.items(), key=lambda item: -item[1]['total']):
+        lines.append(f'{stage_stat["count"]:>7} | {stage_stat["total"] * 1000:>11.2f} | '
+                     f'{stage_stat["mean"] * 1000:>10.2f} | {stage_stat["max"] * 1000:>10.2f} | '
+                     + stage)
+
+    return '\n'.join(lines)
+
+
+def dump_json(filepath: str) -> None:
+    """Write stage_stats() to <filepath> as JSON."""
+    with open(filepath, 'w') as file:
+        json.dump(stage_stats(), file, indent=2)
+
+
+def dump_chrome_trace(filepath: str) -> None:
+    """Write the latest timed calls to <filepath> in the Chrome trace event format, which
+    chrome://tracing, Perfetto and speedscope show as a flamegraph per thread.
+    """
+    with _lock:
+        events = list(_events)
+
+    pid = os.getpid()
+    trace = [{'name': stage, 'cat': stage.partition('.')[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+              'ts': started / 1000, 'dur': duration / 1000}
+             for stage, started, duration, tid in events]
+
+    with open(filepath, 'w') as file:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, file)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['contextlib', 'functools', 'json', 'os', 'threading', 'time',
+                          'collections', 'typing'],  # the names (strs) of imported modules
+        'allowed-io': ['dump_json', 'dump_chrome_trace'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200', 'W0603']
+    })
@@ -0,0 +1,164 @@
+"""CSC110 Fall 2020: Map
+
+Module Description
+==================
+This module contains the code to create and display the 3D world maps that show how
+much land is lost or how much population is displaced for each respective country
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+
+
+from typing import Any, List
+
+import numpy as np
+
+import dataset_processing
+import instrumentation
+
+
+@instrumentation.timed('maps.display_map')
+def display_map(points: List[float], codes: List[str], title: str,
+                country_index: dataset_processing.CountryIndex) -> None:
+    """
+    Function to display a 3d world map that shows how much land is lost or how much population is displayed
+    for each respective country
+
+    <points> are the percentages of the countries with ISO3 codes <codes> (in the same order), and
+    <country_index> is the index returned by dataset_processing.load_country_index.
+
+    Preconditions:
+        - len(points) != 0
+        - len(points) == len(codes)
+    """
+    build_map(points, codes, title, country_index).show()
+
+
+@instrumentation.timed('maps.build_map')
+def build_map(points: List[float], codes: List[str], title: str,
+              country_index: dataset_processing.CountryIndex) -> Any:
+    """
+    Return the plotly figure of the map shown by display_map.
+
+    The points are joined to the countries of <country_index> by code, so their order does not
+    need to match the country-to-code dataset; countries missing from it are left out.
+
+    Preconditions:
+        - len(points) != 0
+        - len(points) == len(codes)
+    """
+    import plotly.graph_objects as go
+
+    positions = dataset_processing.country_positions(country_index, codes)
+    matched = np.flatnonzero(positions >= 0)
+    rows = positions[matched]
+
+    fig = go.Figure(data=go.Choropleth(
+        locations=[country_index.codes[row] for row in rows],
+        z=np.asarray(points, dtype=float)[matched],
+        text=[country_index.names[row] for row in rows],
+        colorscale='Reds',
+        autocolorscale=False,
+        reversescale=False,
+        marker_line_color='darkgray',
+        marker_line_width=0.5,
+        colorbar_ticksuffix='%',
+        colorbar_title='Percentage of<br>' + title,
+    ))
+
+    fig.update_layout(
+        title_text='% Of ' + title,
+        geo=dict(
+            showframe=False,
+            showcoastlines=False,
+            projection_type='orthographic'
+        ),
+        annotations=[dict(
+            x=0.55,
+            y=0.1,
+            xref='paper',
+            yref='paper',
+            text='#',
+            showarrow=False
+        )]
+    )
+
+    return fig
+
+
+def display_scenario_map(points: np.ndarray, codes: List[str], labels: List[str], title: str,
+                         country_index: dataset_processing.CountryIndex) -> None:
+    """
+    Function to display one 3d world map with a slider to step through several scenarios.
+
+    <points> is a (scenarios x countries) matrix of percentages for the countries with ISO3 codes
+    <codes>, and <labels> names each scenario (each row of <points>) on the slider.
+
+    Preconditions:
+        - points.shape == (len(labels), len(codes))
+        - len(labels) != 0
+    """
+    build_scenario_map(points, codes, labels, title, country_index).show()
+
+
+@instrumentation.timed('maps.build_scenario_map')
+def build_scenario_map(points: np.ndarray, codes: List[str], labels: List[str], title: str,
+                       country_index: dataset_processing.CountryIndex) -> Any:
+    """
+    Return the plotly figure of the map shown by display_scenario_map.
+
+    The map starts as build_map of the first scenario, and every scenario is an animation frame
+    that only replaces the z values of the choropleth, so the geometry, country names and layout
+    are shared by all of them. The colour scale is fixed across scenarios so they are comparable.
+
+    Preconditions:
+        - points.shape == (len(labels), len(codes))
+        - len(labels) != 0
+    """
+    matrix = np.asarray(points, dtype=float)
+    fig = build_map(matrix[0].tolist(), codes, title, country_index)
+
+    positions = dataset_processing.country_positions(country_index, codes)
+    matrix = matrix[:, positions >= 0]
+
+    fig.update_traces(zmin=0, zmax=max(float(matrix.max()), 1e-9))
+    fig.frames = [dict(data=[{'type': 'choropleth', 'z': row}], traces=[0], name=label)
+                  for label, row in zip(labels, np.round(matrix, 3).tolist())]
+
+    jump = {'frame': {'duration': 0, 'redraw': True}, 'mode': 'immediate',
+            'transition': {'duration': 0}}
+    play = {'frame': {'duration': 800, 'redraw': True}, 'mode': 'immediate',
+            'fromcurrent': True, 'transition': {'duration': 0}}
+    fig.update_layout(
+        updatemenus=[dict(type='buttons', direction='left', showactive=False,
+                          x=0.1, xanchor='right', y=0, yanchor='top', pad={'r': 10, 't': 70},
+                          buttons=[dict(label='&#9654;', method='animate', args=[None, play]),
+                                   dict(label='&#9724;', method='animate',
+                                        args=[[None], jump])])],
+        sliders=[dict(active=0, currentvalue={'prefix': 'Scenario: '}, len=0.9,
+                      x=0.1, xanchor='left', y=0, yanchor='top', pad={'b': 10, 't': 60},
+                      steps=[dict(label=label, method='animate', args=[[label], jump])
+                             for label in labels])]
+    )
+
+    return fig
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        # the names (strs) of imported modules
+        'extra-imports': ['plotly', 'numpy', 'typing', 'dataset_processing', 'instrumentation'],
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,351 @@
+"""CSC110 Fall 2020: models
+
+Module Description
+==================
+This module contains the registry of regression models the country impact curves can be fitted
+with, and the cross-validated selection of the best model for each country.
+
+Every model fits many rows of y-values against shared x-values at once, and evaluates all of
+its rows at many x-values in one array operation: fit(x, y_rows) returns a (rows x parameters)
+array, and evaluate(parameters, x_new) a (rows x len(x_new)) array. The registered models are
+polynomials of degree 1 and 2, piecewise-linear interpolation, a monotone (PCHIP) spline and a
+log-linear fit; register_model adds more.
+
+select_models scores every candidate model on every country by leave-one-out cross-validation,
+spread over processes, and keeps the model with the lowest error for each country.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+
+# rows (countries) scored per task of select_models
+SELECTION_CHUNK = 1024
+
+
+class RegressionModel(ABC):
+    """A kind of regression, fitting and evaluating many rows of y-values at once.
+
+    This is an abstract class: subclasses implement fit and evaluate.
+
+    Instance Attributes:
+      - name: the name the model is registered under
+      - min_points: the fewest points the model can be fitted on
+    """
+    name: str
+    min_points: int
+
+    @abstractmethod
+    def fit(self, x: np.ndarray, y_rows: np.ndarray) -> np.ndarray:
+        """Return the parameters (one row per row of <y_rows>) of the fits of each row of
+        <y_rows> against <x>.
+
+        Preconditions:
+          - x is sorted in increasing order, without repeats
+          - len(x) >= self.min_points
+          - y_rows.shape == (rows, len(x))
+        """
+
+    @abstractmethod
+    def evaluate(self, parameters: np.ndarray, x_new: np.ndarray) -> np.ndarray:
+        """Return the value of every fit (row of <parameters>, as returned by fit from a
+        single call) at every x in <x_new>, one row per fit.
+        """
+
+
+class PolynomialModel(RegressionModel):
+    """A least-squares polynomial, fitted in terms of (x - centre) / scale as in
+    prediction.polynomial_coefficients. Its parameters are centre, scale and the coefficients
+    in increasing powers.
+
+    Instance Attributes:
+      - degree: the degree of the polynomial
+    """
+    degree: int
+
+    def __init__(self, name: str, degree: int) -> None:
+        self.name = name
+        self.degree = degree
+        self.min_points = degree + 1
+
+    def fit(self, x: np.ndarray, y_rows: np.ndarray) -> np.ndarray:
+        """Return the centre, scale and coefficients of each row's polynomial."""
+        centre = float(x.mean())
+        scale = float(np.abs(x - centre).max()) or 1.0
+        design = np.vander((x - centre) / scale, self.degree + 1, increasing=True)
+        coefficients = y_rows @ np.linalg.pinv(design).T
+
+        return np.column_stack([np.full(len(y_rows), centre), np.full(len(y_rows), scale),
+                                coefficients])
+
+    def evaluate(self, parameters: np.ndarray, x_new: np.ndarray) -> np.ndarray:
+        """Return the value of each row's polynomial at every x in <x_new>."""
+        centre, scale = parameters[0, 0], parameters[0, 1]
+        x_prediction = np.vander((x_new - centre) / scale, self.degree + 1, increasing=True)
+
+        return parameters[:, 2:] @ x_prediction.T
+
+
+class PiecewiseLinearModel(RegressionModel):
+    """Linear interpolation between the points, extended past the first and last point along
+    the first and last segment. Its parameters are the x-values followed by the y-values.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.min_points = 2
+
+    def fit(self, x: np.ndarray, y_rows: np.ndarray) -> np.ndarray:
+        """Return the knots (the points themselves) of each row."""
+        return np.column_stack([np.tile(x, (len(y_rows), 1)), y_rows])
+
+    def evaluate(self, parameters: np.ndarray, x_new: np.ndarray) -> np.ndarray:
+        """Return each row's interpolated value at every x in <x_new>."""
+        knots = parameters.shape[1] // 2
+        x_knots, y_knots = parameters[0, :knots], parameters[:, knots:]
+
+        segment = np.clip(np.searchsorted(x_knots, x_new), 1, knots - 1)
+        x_left, x_right = x_knots[segment - 1], x_knots[segment]
+        weight = (x_new - x_left) / (x_right - x_left)
+
+        return y_knots[:, segment - 1] * (1 - weight) + y_knots[:, segment] * weight
+
+
+class MonotoneSplineModel(RegressionModel):
+    """A piecewise cubic Hermite interpolant with Fritsch-Carlson (PCHIP) slopes, which is
+    monotone wherever the points are, extended linearly past the first and last point. Its
+    parameters are the x-values, then the y-values, then the slopes at each point.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.min_points = 2
+
+    def fit(self, x: np.ndarray, y_rows: np.ndarray) -> np.ndarray:
+        """Return the knots and PCHIP slopes of each row."""
+        widths = np.diff(x)
+        secants = np.diff(y_rows, axis=1) / widths
+        slopes = np.zeros_like(y_rows)
+
+        if len(x) == 2:
+            slopes[:] = secants
+        else:
+            # interior slopes: weighted harmonic mean of the neighbouring secants, 0 at extrema
+            left, right = secants[:, :-1], secants[:, 1:]
+            weight_left = 2 * widths[1:] + widths[:-1]
+            weight_right = widths[1:] + 2 * widths[:-1]
+            same_sign = left * right > 0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                harmonic = (weight_left + weight_right) / (weight_left / left
+                                                           + weight_right / right)
+            slopes[:, 1:-1] = np.where(same_sign, harmonic, 0.0)
+            slopes[:, 0] = end_slope(widths[0], widths[1], secants[:, 0], secants[:, 1])
+            slopes[:, -1] = end_slope(widths[-1], widths[-2], secants[:, -1], secants[:, -2])
+
+        return np.column_stack([np.tile(x, (len(y_rows), 1)), y_rows, slopes])
+
+    def evaluate(self, parameters: np.ndarray, x_new: np.ndarray) -> np.ndarray:
+        """Return the value of each row's spline at every x in <x_new>."""
+        knots = parameters.shape[1] // 3
+        x_knots = parameters[0, :knots]
+        y_knots = parameters[:, knots:2 * knots]
+        slopes = parameters[:, 2 * knots:]
+
+        segment = np.clip(np.searchsorted(x_knots, x_new), 1, knots - 1)
+        x_left = x_knots[segment - 1]
+        width = x_knots[segment] - x_left
+        t = (x_new - x_left) / width
+
+        # Hermite basis inside the knots; past the ends, t is clamped and the line continued
+        inside = np.clip(t, 0.0, 1.0)
+        h00 = (1 + 2 * inside) * (1 - inside) ** 2
+        h10 = inside * (1 - inside) ** 2
+        h01 = inside ** 2 * (3 - 2 * inside)
+        h11 = inside ** 2 * (inside - 1)
+        values = (h00 * y_knots[:, segment - 1] + h10 * width * slopes[:, segment - 1]
+                  + h01 * y_knots[:, segment] + h11 * width * slopes[:, segment])
+
+        before = t < 0
+        after = t > 1
+        values += np.where(before, (x_new - x_knots[0]) * slopes[:, :1], 0.0)
+        values += np.where(after, (x_new - x_knots[-1]) * slopes[:, -1:], 0.0)
+
+        return values
+
+
+class LogLinearModel(RegressionModel):
+    """A least-squares line fitted to log(1 + y), so y = exp(a + b * x) - 1 grows (or decays)
+    exponentially and handles y-values of 0. Its parameters are a and b.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.min_points = 2
+        self._line = PolynomialModel(name, 1)
+
+    def fit(self, x: np.ndarray, y_rows: np.ndarray) -> np.ndarray:
+        """Return the (a, b) of each row."""
+        parameters = self._line.fit(x, np.log1p(np.maximum(y_rows, 0.0)))
+        centre, scale = parameters[:, 0], parameters[:, 1]
+        slope = parameters[:, 3] / scale
+
+        return np.column_stack([parameters[:, 2] - slope * centre, slope])
+
+    def evaluate(self, parameters: np.ndarray, x_new: np.ndarray) -> np.ndarray:
+        """Return the value of each row's fit at every x in <x_new>."""
+        return np.expm1(parameters[:, :1] + parameters[:, 1:] * x_new)
+
+
+class ModelSelection(NamedTuple):
+    """The model chosen for each country, with its parameters.
+
+    <codes> holds the code of every country, <names> the names of the candidate models (in
+    registry order), and <choices> the index (in names) of the model chosen for each country.
+    <scores> is the (countries x candidates) array of leave-one-out root mean squared errors,
+    and row i of <parameters> the parameters of country i's model, padded with nan; the
+    model names[j] has widths[j] parameters. <source_hash> identifies the dataset the models
+    were fitted on.
+    """
+    codes: np.ndarray
+    names: np.ndarray
+    choices: np.ndarray
+    scores: np.ndarray
+    parameters: np.ndarray
+    widths: np.ndarray
+    source_hash: str
+
+
+# the registered models, by name, in the order they are preferred on ties
+MODELS: Dict[str, RegressionModel] = {}
+
+
+def register_model(model: RegressionModel) -> RegressionModel:
+    """Add <model> to MODELS under its name, and return it."""
+    MODELS[model.name] = model
+    return model
+
+
+register_model(PolynomialModel('linear', 1))
+register_model(PolynomialModel('quadratic', 2))
+register_model(PiecewiseLinearModel('piecewise_linear'))
+register_model(MonotoneSplineModel('monotone_spline'))
+register_model(LogLinearModel('log_linear'))
+
+
+def end_slope(width: float, next_width: float, secant: np.ndarray,
+              next_secant: np.ndarray) -> np.ndarray:
+    """Return the PCHIP slopes at an end point, from the widths and secants of the first two
+    segments next to it, limited so that the spline stays monotone.
+    """
+    slope = ((2 * width + next_width) * secant - width * next_secant) / (width + next_width)
+    slope = np.where(np.sign(slope) != np.sign(secant), 0.0, slope)
+
+    return np.where((np.sign(secant) != np.sign(next_secant))
+                    & (np.abs(slope) > np.abs(3 * secant)), 3 * secant, slope)
+
+
+def loo_scores(name: str, x: np.ndarray, y_rows: np.ndarray) -> np.ndarray:
+    """Return the leave-one-out root mean squared error of model <name> on each row of
+    <y_rows>: each point is predicted by the model fitted on the other points.
+
+    Every fold is fitted for all rows at once, so this takes len(x) fits in total.
+
+    >>> loo_scores('linear', np.array([1.0, 2.0, 3.0]), np.array([[2.0, 4.0, 6.0]])).round(9)
+    array([0.])
+
+    Preconditions:
+      - len(x) > MODELS[name].min_points
+    """
+    model = MODELS[name]
+    errors = np.empty(y_rows.shape)
+    for i in range(len(x)):
+        kept = np.arange(len(x)) != i
+        parameters = model.fit(x[kept], y_rows[:, kept])
+        errors[:, i] = model.evaluate(parameters, x[i:i + 1])[:, 0] - y_rows[:, i]
+
+    return np.sqrt(np.mean(errors ** 2, axis=1))
+
+
+def select_models(codes: np.ndarray, x: np.ndarray, y_rows: np.ndarray,
+                  candidates: Optional[List[str]] = None, workers: int = 1,
+                  source_hash: str = '') -> ModelSelection:
+    """Return the selection of the model (among <candidates>, every registered model by
+    default) with the lowest leave-one-out error for each row of <y_rows>, fitted on all of x.
+
+    Each candidate is scored on SELECTION_CHUNK rows at a time; with <workers> > 1 the
+    (candidate, chunk) tasks are spread over that many processes. Candidates that need more
+    points than len(x) - 1 are skipped. Ties go to the candidate listed first.
+
+    Preconditions:
+      - len(codes) == len(y_rows)
+      - x is sorted in increasing order, without repeats
+    """
+    x = np.asarray(x, dtype=float)
+    y_rows = np.asarray(y_rows, dtype=float).reshape((-1, len(x)))
+    names = [name for name in (candidates or list(MODELS)) if MODELS[name].min_points < len(x)]
+
+    starts = list(range(0, len(y_rows), SELECTION_CHUNK)) or [0]
+    tasks = [(name, start) for name in names for start in starts]
+    task_args = [[name for name, _ in tasks], [x] * len(tasks),
+                 [y_rows[start:start + SELECTION_CHUNK] for _, start in tasks]]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(loo_scores, *task_args))
+    else:
+        chunks = list(map(loo_scores, *task_args))
+
+    scores = np.column_stack([np.concatenate(chunks[i * len(starts):(i + 1) * len(starts)])
+                              for i in range(len(names))])
+    choices = np.argmin(np.nan_to_num(scores, nan=np.inf), axis=1)
+
+    fits = [MODELS[name].fit(x, y_rows) for name in names]
+    widths = np.array([fit.shape[1] for fit in fits], dtype=np.int64)
+    parameters = np.full((len(y_rows), widths.max()), np.nan)
+    for i, fit in enumerate(fits):
+        chosen = choices == i
+        parameters[chosen, :widths[i]] = fit[chosen]
+
+    return ModelSelection(np.asarray(codes, dtype=str), np.array(names, dtype=str), choices,
+                          scores, parameters, widths, source_hash)
+
+
+def evaluate_selection(selection: ModelSelection, x_new: np.ndarray) -> np.ndarray:
+    """Return the value of every country's chosen model at every x in <x_new>, as a
+    (len(x_new) x countries) array.
+
+    Countries sharing a model are evaluated together, in one array operation per model.
+    """
+    x_new = np.asarray(x_new, dtype=float)
+    values = np.empty((len(x_new), len(selection.codes)))
+
+    for i, name in enumerate(selection.names):
+        chosen = np.flatnonzero(selection.choices == i)
+        if len(chosen) > 0:
+            parameters = selection.parameters[chosen, :selection.widths[i]]
+            values[:, chosen] = MODELS[str(name)].evaluate(parameters, x_new).T
+
+    return values
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['abc', 'concurrent.futures', 'typing', 'numpy'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,96 @@
+"""CSC110 Fall 2020: models_test
+
+Module Description
+==================
+This module contains the tests of the regression model registry and the cross-validated model
+selection of the models module. Run them with python -m pytest models_test.py.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+import os
+from typing import Any
+
+import numpy as np
+
+import models
+import prediction
+
+
+# the sea levels (in mm) the impact percentages are given at
+SEA_LEVELS = np.array([1000.0, 2000.0, 3000.0, 4000.0, 5000.0])
+
+
+def test_evaluate_selection_matches_each_model() -> None:
+    """Test that evaluate_selection gives every country the values of its chosen model, fitted
+    on that country alone.
+    """
+    y_rows = np.array([[1.0, 2.0, 3.0, 4.0, 5.0], [1.0, 4.0, 9.0, 16.0, 25.0],
+                       [0.0, 0.1, 0.5, 3.0, 9.0], [2.0, 2.5, 3.0, 3.2, 3.3]])
+    selection = models.select_models(np.array(['AAA', 'BBB', 'CCC', 'DDD']), SEA_LEVELS, y_rows)
+    x_new = np.linspace(0.0, 8000.0, 33)
+    values = models.evaluate_selection(selection, x_new)
+
+    assert values.shape == (len(x_new), len(y_rows))
+    for i, y_row in enumerate(y_rows):
+        model = models.MODELS[str(selection.names[selection.choices[i]])]
+        expected = model.evaluate(model.fit(SEA_LEVELS, y_row[None, :]), x_new)[0]
+        assert np.allclose(values[:, i], expected, rtol=1e-9, atol=1e-9)
+
+
+def test_evaluate_selection_with_missing_values() -> None:
+    """Test that a country with a missing value only gets nan itself, even when it comes first
+    among the countries sharing its model.
+    """
+    y_rows = np.array([[0.0, 0.1, np.nan, 3.0, 9.0], [1.0, 2.0, 3.0, 4.0, 5.0]])
+    selection = models.select_models(np.array(['AAA', 'BBB']), SEA_LEVELS, y_rows,
+                                     candidates=['quadratic'])
+    values = models.evaluate_selection(selection, np.array([1500.0, 2500.0]))
+
+    assert np.isnan(values[:, 0]).all()
+    assert np.allclose(values[:, 1], [1.5, 2.5])
+
+
+def test_model_selection_round_trip(tmp_path: Any) -> None:
+    """Test that the model selection of a land loss dataset is stored, loaded back unchanged
+    while the dataset is, and rebuilt once it changes.
+    """
+    filepath = os.path.join(str(tmp_path), 'land_loss.csv')
+    with open(filepath, 'w') as file:
+        file.write('Code,Country,1m,2m,3m,4m,5m\n'
+                   'ARG,Argentina,0.12,0.25,0.4,0.56,0.73\n'
+                   'BHS,Bahamas,5.06,11.3,19.1,26.0,32.3\n')
+
+    built = prediction.land_loss_models(filepath)
+    loaded = prediction.land_loss_models(filepath)
+    for built_field, loaded_field in zip(built, loaded):
+        assert np.array_equal(built_field, loaded_field,
+                              equal_nan=np.asarray(built_field).dtype.kind == 'f')
+    assert built.codes.tolist() == ['ARG', 'BHS']
+    assert np.allclose(models.evaluate_selection(loaded, SEA_LEVELS).T,
+                       [[0.12, 0.25, 0.4, 0.56, 0.73], [5.06, 11.3, 19.1, 26.0, 32.3]],
+                       atol=1.0)
+
+    with open(filepath, 'a') as file:
+        file.write('BLZ,Belize,0.34,0.72,1.2,1.8,2.3\n')
+    rebuilt = prediction.land_loss_models(filepath)
+    assert rebuilt.codes.tolist() == ['ARG', 'BHS', 'BLZ']
+    assert rebuilt.source_hash != built.source_hash
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'typing', 'numpy', 'models', 'prediction'],
+        'allowed-io': ['test_model_selection_round_trip'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -18,17 +18,598 @@ This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus S
 
 import numpy as np
 
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
-import plotly.express as px
-import plotly.graph_objects as go
-
-from typing import List
+import collections
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
 import dataset_processing
+import instrumentation
+import models
+
+
+# sea levels (in mm) at which the impact datasets record each country's impact percentage
+IMPACT_SEA_LEVELS = [sea_level * 1000 for sea_level in range(1, 6)]
+
+# degree of the polynomial fitted to each country's impact curve
+IMPACT_DEGREE = 2
+
+# the country impact curves evaluate_grid can predict with: the quadratic fits, the models
+# chosen by cross-validation, or the monotone lookup tables capped at MAX_IMPACT_PERCENTAGE
+IMPACT_CURVES = ['quadratic', 'selected', 'bounded']
+
+# the bounded curves are tabulated every LOOKUP_STEP mm of sea level rise up to
+# LOOKUP_MAX_SEA_LEVEL mm; larger rises take the value at LOOKUP_MAX_SEA_LEVEL
+LOOKUP_STEP = 10.0
+LOOKUP_MAX_SEA_LEVEL = 100000.0
+MAX_IMPACT_PERCENTAGE = 100.0
+
+# number of scenarios kept by the default scenario cache, which the GUI shares between its
+# buttons so that repeated or toggled inputs return instantly
+SCENARIO_CACHE_SIZE = 128
+
+# draws of the sea level series used by uncertainty_prediction, and the percentiles it returns
+MONTE_CARLO_DRAWS = 10000
+MONTE_CARLO_PERCENTILES = [5.0, 50.0, 95.0]
+
+# draws generated (and fitted) at a time, each chunk from its own random stream, so results
+# depend on the seed only and not on how the chunks are spread over processes
+MONTE_CARLO_CHUNK = 2500
+
+
+class CoefficientTable(NamedTuple):
+    """The fitted impact curve of every country in an impact dataset.
+
+    Row i of <coefficients> holds the polynomial coefficients (in increasing powers) of the
+    country with code codes[i], in terms of (sea level in mm - centre) / scale.
+    <source_hash> is the SHA-256 digest of the dataset the table was fitted on.
+    """
+    codes: np.ndarray
+    coefficients: np.ndarray
+    centre: float
+    scale: float
+    source_hash: str
+
+
+class Scenario(NamedTuple):
+    """The predictions for one (target year, co2 per year) scenario.
+
+    <sea_level_points> is the sea level trajectory from 2014 to the target year, and
+    <sea_level_rise> its final rise. <land_loss> and <pop_displacement> are the national
+    percentages, in the order of countries of their datasets, whose ISO3 codes are
+    <land_loss_codes> and <pop_displacement_codes>.
+    """
+    sea_level_points: List[float]
+    sea_level_rise: float
+    land_loss: List[float]
+    pop_displacement: List[float]
+    land_loss_codes: List[str]
+    pop_displacement_codes: List[str]
+
+
+class ImpactLookup(NamedTuple):
+    """The bounded impact curve of every country, tabulated over a grid of sea level rises.
+
+    Row i of <table> holds the impact percentage of every country (in the order of <codes>)
+    at a sea level rise of i * <step> mm.
+    """
+    codes: np.ndarray
+    step: float
+    table: np.ndarray
+
+
+class ScenarioCache:
+    """A thread-safe least-recently-used cache of Scenarios.
+
+    Instance Attributes:
+      - maxsize: the number of scenarios kept before the least recently used one is evicted
+      - hits: the number of lookups answered from the cache
+      - misses: the number of lookups that were not in the cache
+
+    Representation Invariants:
+      - self.maxsize >= 1
+      - len(self._entries) <= self.maxsize
+    """
+    maxsize: int
+    hits: int
+    misses: int
+    _entries: collections.OrderedDict
+    _lock: threading.Lock
+
+    def __init__(self, maxsize: int = SCENARIO_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[Scenario]:
+        """Return the scenario stored under <key>, or None if there is none."""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            else:
+                self.misses += 1
+                return None
+
+    def put(self, key: Tuple, scenario: Scenario) -> None:
+        """Store <scenario> under <key>, evicting the least recently used scenarios if full."""
+        with self._lock:
+            self._entries[key] = scenario
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def resize(self, maxsize: int) -> None:
+        """Change the number of scenarios kept, evicting the least recently used ones if needed.
+
+        Preconditions:
+          - maxsize >= 1
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every scenario and reset the hit and miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> Dict[str, Any]:
+        """Return the hit and miss counts, current size and maximum size of this cache."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+class GridResult(NamedTuple):
+    """The predictions for a grid of scenarios, as returned by evaluate_grid.
+
+    <sea_level_rise> has the (broadcast) shape of the grid, and <land_loss> and
+    <pop_displacement> have that shape plus a last axis of countries, in the order of
+    <land_loss_codes> and <pop_displacement_codes> respectively.
+    """
+    sea_level_rise: np.ndarray
+    land_loss: np.ndarray
+    pop_displacement: np.ndarray
+    land_loss_codes: np.ndarray
+    pop_displacement_codes: np.ndarray
+
+
+class UncertaintyResult(NamedTuple):
+    """The percentile bands of the predictions for one scenario, as returned by
+    uncertainty_prediction.
+
+    Row i of each array holds the percentiles[i]-th percentile over all <draws>: of every point
+    of the sea level trajectory in <sea_level_points>, of its final rise in <sea_level_rise>,
+    and of every country in <land_loss> and <pop_displacement>, in the order of
+    <land_loss_codes> and <pop_displacement_codes>.
+    """
+    percentiles: List[float]
+    draws: int
+    sea_level_points: np.ndarray
+    sea_level_rise: np.ndarray
+    land_loss: np.ndarray
+    pop_displacement: np.ndarray
+    land_loss_codes: np.ndarray
+    pop_displacement_codes: np.ndarray
+
+
+class SeaLevelRegression:
+    """The linear least-squares fit of sea level (y) on co2 emissions (x), kept as sufficient
+    statistics (the number of observations and the sums of x, y, xy and x^2) so that adding or
+    removing an observation takes O(1).
+
+    The sums are of x and y minus the first observation added (<x_shift>, <y_shift>), since
+    squares of raw co2 emissions (around 1e10 tonnes) would swamp the differences the slope
+    depends on.
+
+    Instance Attributes:
+      - count: the number of observations
+      - x_shift, y_shift: the values subtracted from every x and y before summing
+      - sum_x, sum_y, sum_xy, sum_xx: the sums of the shifted observations
+    """
+    count: int
+    x_shift: float
+    y_shift: float
+    sum_x: float
+    sum_y: float
+    sum_xy: float
+    sum_xx: float
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.x_shift = 0.0
+        self.y_shift = 0.0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+        self.sum_xx = 0.0
+
+    def add(self, x: float, y: float, weight: int = 1) -> None:
+        """Add the observation (<x>, <y>), or remove it if <weight> is -1."""
+        if self.count == 0:
+            self.x_shift, self.y_shift = x, y
+
+        x -= self.x_shift
+        y -= self.y_shift
+        self.count += weight
+        self.sum_x += weight * x
+        self.sum_y += weight * y
+        self.sum_xy += weight * x * y
+        self.sum_xx += weight * x * x
+
+    def remove(self, x: float, y: float) -> None:
+        """Remove the observation (<x>, <y>), which was added before."""
+        self.add(x, y, -1)
+
+    def slope(self) -> float:
+        """Return the slope (in mm of sea level per metric tonne of co2) of the fit.
+
+        Preconditions:
+          - there are at least 2 observations with different x
+        """
+        return ((self.count * self.sum_xy - self.sum_x * self.sum_y)
+                / (self.count * self.sum_xx - self.sum_x * self.sum_x))
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        """Return the fitted sea level at each co2 emission of <x>.
+
+        Preconditions:
+          - there are at least 2 observations with different x
+        """
+        slope = self.slope()
+        intercept = (self.sum_y - slope * self.sum_x) / self.count
+
+        return self.y_shift + intercept + slope * (np.asarray(x, dtype=float) - self.x_shift)
+
+
+class SeaLevelModel:
+    """The sea level regression of sea_level_prediction, kept up to date as its co2 and sea
+    level datasets change.
+
+    The observations are the world co2 totals of dataset_processing.load_co2_emissions and the
+    sea levels of load_sea_level_series, matched by year; both are cached by dataset version,
+    so a refresh only parses a dataset that changed. When the datasets only gained years, each
+    new year is added to the regression in O(1); when a year already fitted changed or was
+    removed, the regression is refitted from scratch.
+
+    Instance Attributes:
+      - filepath_sea_level, filepath_co2: the paths of the datasets
+      - years: the (first, last) years, inclusive, observations are taken from
+      - regression: the fit of every year observed in both datasets
+    """
+    filepath_sea_level: str
+    filepath_co2: str
+    years: Tuple[int, int]
+    regression: SeaLevelRegression
+    # mapping from year to the (co2, sea level) observation added to the regression
+    _observations: Dict[int, Tuple[float, float]]
+    # the observed years, co2 emissions and sea levels, in order of year
+    _arrays: Tuple[np.ndarray, np.ndarray, np.ndarray]
+    # the loaded co2 emissions and sea level series the observations were taken from
+    _sources: Tuple[Any, Any]
+    _lock: threading.Lock
+
+    def __init__(self, filepath_sea_level: str, filepath_co2: str,
+                 years: Tuple[int, int]) -> None:
+        self.filepath_sea_level = filepath_sea_level
+        self.filepath_co2 = filepath_co2
+        self.years = years
+        self.regression = SeaLevelRegression()
+        self._observations = {}
+        self._arrays = (np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0))
+        self._sources = (None, None)
+        self._lock = threading.Lock()
+
+    def refresh(self) -> int:
+        """Update the regression with the current versions of the datasets, and return the
+        number of years whose observation was added or changed.
+        """
+        with self._lock:
+            emissions = dataset_processing.load_co2_emissions(self.filepath_co2)
+            series = dataset_processing.load_sea_level_series(self.filepath_sea_level)
+            if self._sources[0] is emissions and self._sources[1] is series:
+                return 0
+
+            co2 = dict(zip(emissions.years.tolist(), emissions.world.tolist()))
+            # as for co2, the last row of a year gives its sea level
+            sea_levels = dict(zip(series['year'].tolist(), series['gmsl'].tolist()))
+            observations = {year: (co2[year], sea_levels[year])
+                            for year in sorted(co2.keys() & sea_levels.keys())
+                            if self.years[0] <= year <= self.years[1]}
+
+            changed = [year for year in observations
+                       if self._observations.get(year) != observations[year]]
+            if (any(year in self._observations for year in changed)
+                    or not self._observations.keys() <= observations.keys()):
+                self.regression = SeaLevelRegression()
+                added = list(observations)
+            else:
+                added = changed
+            for year in added:
+                self.regression.add(*observations[year])
+
+            self._observations = observations
+            self._arrays = (np.array(list(observations), dtype=np.int64),
+                            np.array([co2 for co2, _ in observations.values()], dtype=float),
+                            np.array([level for _, level in observations.values()], dtype=float))
+            self._sources = (emissions, series)
+
+            return len(changed)
+
+    def observations(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the years observed in both datasets, in order, with their co2 emissions and
+        sea levels, as of the last refresh.
+        """
+        with self._lock:
+            return self._arrays
+
+    def slope(self) -> float:
+        """Return the slope of the regression as of the last refresh.
+
+        Preconditions:
+          - at least 2 years with different co2 emissions were observed
+        """
+        with self._lock:
+            return self.regression.slope()
+
+
+# the cache used by scenario_prediction when no other cache is given
+scenario_cache = ScenarioCache()
+
+# the models returned by sea_level_model, by (sea level path, co2 path, years)
+_sea_level_models: Dict[Tuple[str, str, Tuple[int, int]], SeaLevelModel] = {}
+_sea_level_models_lock = threading.Lock()
+
+
+@instrumentation.timed('prediction.scenario_prediction')
+def scenario_prediction(filepath_sea_level: str, filepath_co2: str, filepath_land_loss: str,
+                        filepath_pop_displacement: str, year_input: int, co2_input: float,
+                        cache: Optional[ScenarioCache] = None,
+                        curves: str = 'quadratic') -> Scenario:
+    """
+    Return the predictions for reaching <year_input> while emitting <co2_input> metric tonnes
+    of co2 per year, as computed by sea_level_prediction and the national stats functions.
+    <curves> (one of IMPACT_CURVES) picks the country curves, as in evaluate_grid; the national
+    stats functions use the quadratic fits.
+
+    Scenarios are looked up in <cache> (scenario_cache by default) first, keyed on the
+    normalized inputs, the curves and the current version of every dataset, so a repeated
+    scenario is never recomputed.
+
+    Preconditions:
+        - year_input > 2013
+        - co2_input >= 1
+    """
+    if cache is None:
+        cache = scenario_cache
+
+    filepaths = [filepath_sea_level, filepath_co2, filepath_land_loss, filepath_pop_displacement]
+    key = tuple((os.path.abspath(filepath), dataset_processing.file_signature(filepath))
+                for filepath in filepaths) + (int(year_input), float(co2_input), curves)
+
+    scenario = cache.get(key)
+    if scenario is None:
+        years = int(year_input) - 2013
+        sea_level_points = sea_level_prediction(filepath_sea_level, filepath_co2,
+                                                years * float(co2_input), False, years)
+        sea_level_rise = sea_level_points[-1] - sea_level_points[0]
+
+        if curves == 'quadratic':
+            scenario = Scenario(sea_level_points, sea_level_rise,
+                                land_loss_national_stats(filepath_land_loss, sea_level_rise),
+                                pop_displacement_national_stats(filepath_pop_displacement,
+                                                                sea_level_rise),
+                                dataset_processing.load_dataset(
+                                    filepath_land_loss, land_loss_coefficients
+                                ).codes.tolist(),
+                                dataset_processing.load_dataset(
+                                    filepath_pop_displacement, pop_displacement_coefficients
+                                ).codes.tolist())
+        else:
+            land_loss_loader, pop_displacement_loader, curve_grid = impact_curve_functions(curves)
+            land_loss_table = dataset_processing.load_dataset(filepath_land_loss,
+                                                              land_loss_loader)
+            pop_displacement_table = dataset_processing.load_dataset(filepath_pop_displacement,
+                                                                     pop_displacement_loader)
+            rises = np.array([sea_level_rise])
+            scenario = Scenario(sea_level_points, sea_level_rise,
+                                curve_grid(land_loss_table, rises)[0].tolist(),
+                                curve_grid(pop_displacement_table, rises)[0].tolist(),
+                                land_loss_table.codes.tolist(),
+                                pop_displacement_table.codes.tolist())
+        cache.put(key, scenario)
+
+    return scenario
+
+
+@instrumentation.timed('prediction.evaluate_grid')
+def evaluate_grid(years: np.ndarray, co2_per_year: np.ndarray, filepath_sea_level: str,
+                  filepath_co2: str, filepath_land_loss: str,
+                  filepath_pop_displacement: str, curves: str = 'quadratic') -> GridResult:
+    """
+    Return the predictions for every scenario of reaching a target year in <years> while
+    emitting co2 per year (in metric tonnes) in <co2_per_year>; the two arrays are broadcast
+    against each other, so paired arrays, or e.g. years[:, None] and co2_per_year[None, :] for
+    a full grid, can be given. The results match scenario_prediction for each scenario.
+
+    <curves> (one of IMPACT_CURVES) picks the country curves: the quadratic fits (as in
+    scenario_prediction), the models chosen by cross-validation (see land_loss_models) or the
+    monotone curves capped at 100% (see land_loss_lookup).
+
+    The sea level model is fitted once, the rise of every scenario follows from its slope in a
+    single broadcast, and every country curve is evaluated for every scenario in one
+    (scenarios x countries) matrix product. The national results take 8 bytes per scenario
+    and country each, so very large grids should be evaluated in chunks.
+
+    Preconditions:
+        - np.all(years > 2013)
+        - np.all(co2_per_year >= 1)
+    """
+    years, co2_per_year = np.broadcast_arrays(np.asarray(years, dtype=float),
+                                              np.asarray(co2_per_year, dtype=float))
+
+    # sea_level_prediction spreads the total co2 over (year - 2013) points, so its rise
+    # (last point - first point) is slope * total co2, or 0 when there is a single point
+    steps = years - 2013
+    sea_level_rise = np.where(steps >= 2, sea_level_slope(filepath_sea_level, filepath_co2)
+                              * steps * co2_per_year, 0.0)
+
+    land_loss_loader, pop_displacement_loader, curve_grid = impact_curve_functions(curves)
+    land_loss_table = dataset_processing.load_dataset(filepath_land_loss, land_loss_loader)
+    pop_displacement_table = dataset_processing.load_dataset(filepath_pop_displacement,
+                                                             pop_displacement_loader)
+
+    return GridResult(sea_level_rise,
+                      curve_grid(land_loss_table, sea_level_rise),
+                      curve_grid(pop_displacement_table, sea_level_rise),
+                      land_loss_table.codes, pop_displacement_table.codes)
+
+
+def impact_curve_functions(curves: str) -> Tuple[Callable[[str], Any], Callable[[str], Any],
+                                                 Callable[[Any, np.ndarray], np.ndarray]]:
+    """
+    Return the loaders of the land loss and population displacement curves named <curves>,
+    and the function evaluating such curves for an array of sea level rises.
+
+    Preconditions:
+        - curves in IMPACT_CURVES
+    """
+    if curves == 'selected':
+        return land_loss_models, pop_displacement_models, model_selection_grid
+    elif curves == 'bounded':
+        return land_loss_lookup, pop_displacement_lookup, impact_lookup_grid
+    else:
+        return land_loss_coefficients, pop_displacement_coefficients, coefficient_table_grid
+
+
+def sea_level_slope(filepath_sea_level: str, filepath_co2: str) -> float:
+    """
+    Return the slope (in mm of sea level per metric tonne of co2) of the linear sea level
+    regression used by sea_level_prediction.
+
+    This is the slope of sea_level_model, so years appended to the datasets only cost an O(1)
+    update of the fit.
+    """
+    return sea_level_model(filepath_sea_level, filepath_co2).slope()
+
+
+def sea_level_model(filepath_sea_level: str, filepath_co2: str,
+                    years: Optional[Tuple[int, int]] = None) -> SeaLevelModel:
+    """
+    Return the SeaLevelModel of the datasets at <filepath_sea_level> and <filepath_co2>,
+    refreshed with any changes made to them since the last call. <years>
+    defaults to the years covered by both dataset_processing.CO2_YEARS and SEA_LEVEL_YEARS.
+    """
+    if years is None:
+        years = (max(dataset_processing.CO2_YEARS[0], dataset_processing.SEA_LEVEL_YEARS[0]),
+                 min(dataset_processing.CO2_YEARS[1], dataset_processing.SEA_LEVEL_YEARS[1]))
+    key = (os.path.abspath(filepath_sea_level), os.path.abspath(filepath_co2), years)
 
+    with _sea_level_models_lock:
+        model = _sea_level_models.get(key)
+        if model is None:
+            model = SeaLevelModel(filepath_sea_level, filepath_co2, years)
+            _sea_level_models[key] = model
 
+    model.refresh()
+    return model
+
+
+@instrumentation.timed('prediction.uncertainty_prediction')
+def uncertainty_prediction(filepath_sea_level: str, filepath_co2: str, filepath_land_loss: str,
+                           filepath_pop_displacement: str, year_input: int, co2_input: float,
+                           draws: int = MONTE_CARLO_DRAWS,
+                           percentiles: Optional[List[float]] = None,
+                           seed: int = 0, workers: int = 1) -> UncertaintyResult:
+    """
+    Return the percentile bands (MONTE_CARLO_PERCENTILES by default) of the predictions of
+    scenario_prediction for the same inputs, propagating the uncertainty of the sea level
+    dataset (its GMSL uncertainty column, taken as one standard deviation) by Monte Carlo.
+
+    <draws> perturbed copies of the sea level series are fitted at once, chunk by chunk, as a
+    batched least-squares; with <workers> > 1 the chunks are spread over that many processes.
+    The rise of every draw is then put through the country curves in one matrix product.
+    The results depend on <seed> but not on <workers>.
+
+    Preconditions:
+        - year_input > 2013
+        - co2_input >= 1
+        - draws >= 1
+    """
+    if percentiles is None:
+        percentiles = MONTE_CARLO_PERCENTILES
+
+    chunk_sizes = [min(MONTE_CARLO_CHUNK, draws - start)
+                   for start in range(0, draws, MONTE_CARLO_CHUNK)]
+    chunk_seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    chunk_args = [[filepath_sea_level] * len(chunk_sizes), [filepath_co2] * len(chunk_sizes),
+                  chunk_sizes, chunk_seeds]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(sea_level_draw_coefficients, *chunk_args))
+    else:
+        chunks = list(map(sea_level_draw_coefficients, *chunk_args))
+
+    coefficients = np.concatenate([chunk[0] for chunk in chunks])
+    _, centre, scale = chunks[0]
+
+    years = int(year_input) - 2013
+    total_co2 = years * float(co2_input)
+    x_list, _ = sea_level_observations(filepath_sea_level, filepath_co2)
+    x_future = np.linspace(x_list[-1], x_list[-1] + total_co2, years)
+
+    # the (draws x points) trajectories are evaluated a block of points at a time, so long
+    # horizons never hold every draw of every point in memory at once
+    sea_level_points = np.concatenate(
+        [np.percentile(evaluate_polynomials(coefficients, centre, scale, x_future[i:i + 256]),
+                       percentiles, axis=0)
+         for i in range(0, years, 256)], axis=1)
+
+    # as in evaluate_grid, the rise of each draw is its slope * total co2 (0 for one point)
+    sea_level_rise = coefficients[:, 1] / scale * total_co2 if years >= 2 else np.zeros(draws)
+
+    land_loss_table = dataset_processing.load_dataset(filepath_land_loss, land_loss_coefficients)
+    pop_displacement_table = dataset_processing.load_dataset(filepath_pop_displacement,
+                                                             pop_displacement_coefficients)
+
+    return UncertaintyResult(
+        list(percentiles), draws, sea_level_points,
+        np.percentile(sea_level_rise, percentiles),
+        np.percentile(coefficient_table_grid(land_loss_table, sea_level_rise), percentiles,
+                      axis=0),
+        np.percentile(coefficient_table_grid(pop_displacement_table, sea_level_rise), percentiles,
+                      axis=0),
+        land_loss_table.codes, pop_displacement_table.codes)
+
+
+def sea_level_draw_coefficients(filepath_sea_level: str, filepath_co2: str, draws: int,
+                                seed: Any) -> Tuple[np.ndarray, float, float]:
+    """
+    Return polynomial_coefficients (coefficients, centre, scale) of the linear sea level
+    regression fitted on each of <draws> copies of the sea level series, each perturbed by
+    normal noise with the series' uncertainty as standard deviation, drawn from <seed>.
+    """
+    years, x_list, y_list = sea_level_model(filepath_sea_level, filepath_co2).observations()
+    uncertainty = sea_level_uncertainty(filepath_sea_level, years)
+
+    noise = np.random.default_rng(seed).standard_normal((draws, len(y_list)))
+    noise *= uncertainty
+    noise += y_list
+
+    return polynomial_coefficients(x_list, noise, 1)
+
+
+@instrumentation.timed('prediction.sea_level_prediction')
 def sea_level_prediction(filepath_sea_level: str, filepath_co2: str, co2_input: float,
                          display_graph: bool, years: int) -> List[float]:
     """
@@ -41,12 +622,7 @@ def sea_level_prediction(filepath_sea_level: str, filepath_co2: str, co2_input:
         - co2_input >= 1
         - years >= 1
     """
-    # mappings from Year (datetime.date) to Value (float)
-    sea_level_data = dataset_processing.process_sea_level(filepath_sea_level)
-    co2_data = dataset_processing.process_co2(filepath_co2)
-
-    x_list = [co2_data[year] for year in co2_data]
-    y_list = [sea_level_data[year] for year in sea_level_data]
+    x_list, y_list = sea_level_observations(filepath_sea_level, filepath_co2)
 
     # x_future = x_list + list(range(int(x_list[-1]), int(x_list[-1] + co2_input), 350))
     x_future = list(np.linspace(x_list[-1], x_list[-1] + co2_input, years))
@@ -60,15 +636,145 @@ def sea_level_prediction(filepath_sea_level: str, filepath_co2: str, co2_input:
     return sea_level_points
 
 
-def land_loss_prediction(filepath_land_loss: str, sea_level_rise: float, country_code: str) -> float:
+@instrumentation.timed('prediction.sea_level_trajectories')
+def sea_level_trajectories(filepath_sea_level: str, filepath_co2: str, years: np.ndarray,
+                           co2_per_year: np.ndarray) -> List[np.ndarray]:
+    """
+    Return the sea level trajectory sea_level_prediction gives for every scenario of reaching
+    years[i] while emitting co2_per_year[i] metric tonnes of co2 per year, without plotting.
+    The regression is fitted once for all scenarios.
+
+    Preconditions:
+        - np.all(years > 2013)
+        - np.all(co2_per_year >= 1)
+    """
+    x_list, y_list = sea_level_observations(filepath_sea_level, filepath_co2)
+    coefficients, centre, scale = polynomial_coefficients(x_list, [y_list], 1)
+
+    trajectories = []
+    for year_input, co2_input in zip(years, co2_per_year):
+        steps = int(year_input) - 2013
+        x_future = np.linspace(x_list[-1], x_list[-1] + steps * float(co2_input), steps)
+        trajectories.append(evaluate_polynomials(coefficients, centre, scale, x_future)[0])
+
+    return trajectories
+
+
+@instrumentation.timed('prediction.monthly_sea_level_prediction')
+def monthly_sea_level_prediction(filepath_sea_level_monthly: str, filepath_co2: str,
+                                 co2_input: float, display_graph: bool, years: int) -> List[float]:
+    """
+    Display a graph of the regression and then return the monthly sea level rise points.
+    This is sea_level_prediction fitted on a monthly sea level series (such as
+    csiro_recons_gmsl_mo_2015_csv.csv) instead of a yearly one, returning 12 points per year.
+    <co2_input> represents the user-decided total co2 emissions output in metric tons.
+    <years> represents the total years the prediction algorithm will run for.
+    <display_graph> represents whether the graph should be shown at the end of calculation.
+
+    Preconditions:
+        - co2_input >= 1
+        - years >= 1
+    """
+    x_array, y_array = monthly_sea_level_observations(filepath_sea_level_monthly, filepath_co2)
+
+    x_future = np.linspace(x_array[-1], x_array[-1] + co2_input, years * 12)
+
+    coefficients, centre, scale = polynomial_coefficients(x_array, y_array, 1)
+    sea_level_points = evaluate_polynomials(coefficients, centre, scale, x_future)[0].tolist()
+
+    if display_graph:
+        show_graph(x_array, y_array, x_future, sea_level_points,
+                   ['Monthly Sea Level Rise vs. CO2 Emissions', 'CO2 Emissions (metric tons/year)',
+                    'Sea Level (mm)'])
+
+    return sea_level_points
+
+
+def monthly_sea_level_observations(filepath_sea_level_monthly: str,
+                                   filepath_co2: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the observed (co2 emissions, sea levels) of every month covered by both datasets.
+    The annual co2 emissions are linearly interpolated onto the months, taking each year's
+    emissions as the rate at the middle of that year.
+    """
+    # mapping from Year (datetime.date) to Value (float)
+    co2_data = dataset_processing.load_co2(filepath_co2)
+    co2_years = np.array([date.year for date in co2_data], dtype=float)
+    co2_values = np.array(list(co2_data.values()), dtype=float)
+
+    sea_level_series = dataset_processing.load_sea_level_series(filepath_sea_level_monthly)
+    in_range = ((sea_level_series['year'] >= co2_years.min())
+                & (sea_level_series['year'] <= co2_years.max()))
+    months = sea_level_series[in_range]
+
+    month_times = months['year'] + (months['month'] - 0.5) / 12
+    x_array = np.interp(month_times, co2_years + 0.5, co2_values)
+
+    return x_array, months['gmsl']
+
+
+def sea_level_observations(filepath_sea_level: str, filepath_co2: str,
+                           years: Optional[Tuple[int, int]] = None
+                           ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the observed (co2 emissions, sea levels) the sea level regression is fitted on: those
+    of every year of <years> (see sea_level_model) observed in both datasets, in order of year.
+    """
+    _, x_list, y_list = sea_level_model(filepath_sea_level, filepath_co2, years).observations()
+
+    return x_list, y_list
+
+
+def sea_level_uncertainty(filepath_sea_level: str, years: np.ndarray) -> np.ndarray:
+    """
+    Return the uncertainty (in mm) of the sea level of each year of <years>, or 0 for datasets
+    without an uncertainty column.
+
+    Preconditions:
+        - the dataset has a row for each year of <years>
+    """
+    sea_level_series = dataset_processing.load_sea_level_series(filepath_sea_level)
+    # as in SeaLevelModel, the last row of a year gives its sea level
+    uncertainty = dict(zip(sea_level_series['year'].tolist(),
+                           sea_level_series['uncertainty'].tolist()))
+
+    return np.nan_to_num(np.array([uncertainty[year] for year in years.tolist()]), nan=0.0)
+
+
+def show_sea_level_graph(filepath_sea_level: str, filepath_co2: str, co2_input: float,
+                         sea_level_points: List[float]) -> None:
+    """
+    Show the graph sea_level_prediction displays when it returns <sea_level_points> for
+    <co2_input>, without redoing the regression.
+    """
+    build_sea_level_graph(filepath_sea_level, filepath_co2, co2_input, sea_level_points).show()
+
+
+@instrumentation.timed('prediction.build_sea_level_graph')
+def build_sea_level_graph(filepath_sea_level: str, filepath_co2: str, co2_input: float,
+                          sea_level_points: List[float]) -> Any:
+    """
+    Return the plotly figure shown by show_sea_level_graph.
+    """
+    x_list, y_list = sea_level_observations(filepath_sea_level, filepath_co2)
+    x_future = list(np.linspace(x_list[-1], x_list[-1] + co2_input, len(sea_level_points)))
+
+    return build_graph(x_list, y_list, x_future, sea_level_points,
+                       ['Sea Level Rise vs. CO2 Emissions', 'CO2 Emissions (metric tons)',
+                        'Sea Level (mm)'])
+
+
+@instrumentation.timed('prediction.land_loss_prediction')
+def land_loss_prediction(land_loss_data: Dict[str, List[float]], sea_level_rise: float,
+                         country_code: str) -> float:
     """
     Return the total land loss percentage.
+    <land_loss_data> is the mapping returned by dataset_processing.load_land_loss.
 
     Preconditions:
       - country_code is a three-letter ISO3166-1 alpha-3 code representing a country name
+      - country_code in land_loss_data
     """
-    land_loss_data = dataset_processing.process_land_loss(filepath_land_loss)
-
     x_list = [sea_level for sea_level in range(1, 6)]
     y_list = [land_loss_data[country_code][sea_level - 1] for sea_level in x_list]
 
@@ -87,15 +793,17 @@ def land_loss_prediction(filepath_land_loss: str, sea_level_rise: float, country
         return land_loss_points[0]
 
 
-def pop_displacement_prediction(filepath_pop_displacement: str, sea_level_rise: float, country_code: str) -> float:
+@instrumentation.timed('prediction.pop_displacement_prediction')
+def pop_displacement_prediction(pop_displacement_data: Dict[str, List[float]], sea_level_rise: float,
+                                country_code: str) -> float:
     """
     Return the total population displacement percentage.
+    <pop_displacement_data> is the mapping returned by dataset_processing.load_pop_displacement.
 
     Preconditions:
       - country_code is a three-letter ISO3166-1 alpha-3 code representing a country name
+      - country_code in pop_displacement_data
     """
-    pop_displacement_data = dataset_processing.process_pop_displacement(filepath_pop_displacement)
-
     x_list = [sea_level for sea_level in range(1, 6)]
     y_list = [pop_displacement_data[country_code][sea_level - 1] for sea_level in x_list]
 
@@ -114,59 +822,321 @@ def pop_displacement_prediction(filepath_pop_displacement: str, sea_level_rise:
         return pop_displacement_points[0]
 
 
+@instrumentation.timed('prediction.land_loss_national_stats')
 def land_loss_national_stats(filepath_land_loss: str, sea_level_rise: float) -> List[float]:
     """
     Return a list of predicted national land-loss percentages in the same order of countries as in land_loss.csv.
     """
-    land_loss_data = dataset_processing.process_land_loss(filepath_land_loss)
-
-    national_land_loss = []
-    for country_code in land_loss_data:
-        national_land_loss.append(land_loss_prediction(filepath_land_loss, sea_level_rise, country_code))
+    land_loss_table = dataset_processing.load_dataset(filepath_land_loss, land_loss_coefficients)
 
-    return national_land_loss
+    return coefficient_table_points(land_loss_table, sea_level_rise)
 
 
+@instrumentation.timed('prediction.pop_displacement_national_stats')
 def pop_displacement_national_stats(filepath_pop_displacement: str, sea_level_rise: float) -> List[float]:
     """
     Return a list of predicted national population displacement percentages in the same
     order of countries as in pop_displacement.csv.
     """
-    pop_displacement_data = dataset_processing.process_pop_displacement(filepath_pop_displacement)
+    pop_displacement_table = dataset_processing.load_dataset(filepath_pop_displacement,
+                                                             pop_displacement_coefficients)
+
+    return coefficient_table_points(pop_displacement_table, sea_level_rise)
+
+
+def coefficient_table_points(table: CoefficientTable, sea_level_rise: float) -> List[float]:
+    """
+    Return the predicted impact percentage of every country in <table> for <sea_level_rise>,
+    in the same order of countries as table.codes.
+
+    As in land_loss_prediction, negative predictions are clamped to 0.
+    """
+    impact_points = evaluate_polynomials(table.coefficients, table.centre, table.scale,
+                                         [sea_level_rise])[:, 0]
+
+    return np.maximum(impact_points, 0.0).tolist()
+
+
+def coefficient_table_grid(table: CoefficientTable, sea_level_rise: np.ndarray) -> np.ndarray:
+    """
+    Return the predicted impact percentage of every country in <table> for every sea level
+    rise in <sea_level_rise>, as an array of shape sea_level_rise.shape + (countries,).
+
+    As in land_loss_prediction, negative predictions are clamped to 0.
+    """
+    x = (np.ravel(sea_level_rise) - table.centre) / table.scale
+    x_prediction = np.vander(x, table.coefficients.shape[1], increasing=True)
+    impact_points = x_prediction @ table.coefficients.T
+    np.maximum(impact_points, 0.0, out=impact_points)
+
+    return impact_points.reshape(np.shape(sea_level_rise) + (len(table.codes),))
+
+
+def model_selection_grid(selection: models.ModelSelection,
+                         sea_level_rise: np.ndarray) -> np.ndarray:
+    """
+    Return the predicted impact percentage of every country in <selection> for every sea level
+    rise in <sea_level_rise>, as coefficient_table_grid does for a coefficient table.
+    """
+    impact_points = models.evaluate_selection(selection, np.ravel(sea_level_rise))
+    np.maximum(impact_points, 0.0, out=impact_points)
+
+    return impact_points.reshape(np.shape(sea_level_rise) + (len(selection.codes),))
+
+
+def impact_lookup_grid(lookup: ImpactLookup, sea_level_rise: np.ndarray) -> np.ndarray:
+    """
+    Return the impact percentage of every country in <lookup> for every sea level rise in
+    <sea_level_rise>, as an array of shape sea_level_rise.shape + (countries,).
+
+    Since the table's rises are evenly spaced, the row of each rise follows from a division,
+    and every country is interpolated at once from the two rows around it.
+    """
+    last_row = len(lookup.table) - 1
+    position = np.clip(np.ravel(sea_level_rise) / lookup.step, 0.0, last_row)
+    row = np.minimum(position.astype(np.intp), last_row - 1)
+    weight = (position - row)[:, np.newaxis]
+
+    # lower + (upper - lower) * weight, computed in place on the two gathered rows
+    impact_points = lookup.table[row]
+    upper_points = lookup.table[row + 1]
+    upper_points -= impact_points
+    upper_points *= weight
+    impact_points += upper_points
+
+    return impact_points.reshape(np.shape(sea_level_rise) + (len(lookup.codes),))
+
+
+def build_impact_lookup(impact_data: Dict[str, List[float]]) -> ImpactLookup:
+    """
+    Return the bounded impact curves of every country in <impact_data>, which maps a country
+    code to its impact percentages at [1m, 2m, ..., 5m] of sea rise.
+
+    Each curve interpolates linearly between 0% at no rise and the country's percentages at
+    1m to 5m, made non-decreasing (a percentage below the one of a smaller rise is raised to
+    it). Past 5m the curve continues along its last segment. It is capped at
+    MAX_IMPACT_PERCENTAGE, and tabulated every LOOKUP_STEP mm up to LOOKUP_MAX_SEA_LEVEL.
+    """
+    codes = np.array(list(impact_data), dtype=str)
+    y_rows = np.array([impact_data[country_code] for country_code in impact_data], dtype=float)
+    y_rows = np.maximum.accumulate(np.clip(y_rows, 0.0, MAX_IMPACT_PERCENTAGE), axis=1)
+
+    x_knots = np.array([0.0] + IMPACT_SEA_LEVELS)
+    y_knots = np.column_stack([np.zeros(len(y_rows)), y_rows])
+    sea_levels = np.arange(0.0, LOOKUP_MAX_SEA_LEVEL + LOOKUP_STEP / 2, LOOKUP_STEP)
+
+    curves = models.MODELS['piecewise_linear']
+    table = curves.evaluate(curves.fit(x_knots, y_knots), sea_levels).T
+    # the interpolation can round a flat segment down by an ulp, so the rows are made
+    # non-decreasing again
+    table = np.maximum.accumulate(np.clip(table, 0.0, MAX_IMPACT_PERCENTAGE), axis=0)
+
+    return ImpactLookup(codes, LOOKUP_STEP, np.ascontiguousarray(table))
+
+
+def land_loss_lookup(filepath_land_loss: str) -> ImpactLookup:
+    """Return the bounded land loss curves of the land loss dataset at <filepath_land_loss>."""
+    return build_impact_lookup(dataset_processing.load_land_loss(filepath_land_loss))
+
+
+def pop_displacement_lookup(filepath_pop_displacement: str) -> ImpactLookup:
+    """Return the bounded population displacement curves of the population displacement
+    dataset at <filepath_pop_displacement>.
+    """
+    return build_impact_lookup(
+        dataset_processing.load_pop_displacement(filepath_pop_displacement))
+
+
+def fit_coefficient_table(impact_data: Dict[str, List[float]],
+                          source_hash: str) -> CoefficientTable:
+    """
+    Return the coefficient table of every country in <impact_data>, fitted in a single batch.
+    <impact_data> maps a country code to its impact percentages at [1m, 2m, ..., 5m] of sea rise.
+    """
+    codes = np.array(list(impact_data), dtype=str)
+    y_rows = np.array([impact_data[country_code] for country_code in impact_data], dtype=float)
+
+    coefficients, centre, scale = polynomial_coefficients(IMPACT_SEA_LEVELS, y_rows, IMPACT_DEGREE)
+
+    return CoefficientTable(codes, coefficients, centre, scale, source_hash)
+
+
+@instrumentation.timed('prediction.build_coefficient_table')
+def build_coefficient_table(filepath: str,
+                            loader: Callable[[str], Dict[str, List[float]]]) -> CoefficientTable:
+    """
+    Fit every country of the impact dataset at <filepath> (parsed with <loader>), write the
+    resulting table to its .npz file in the dataset's cache directory and return it.
+    """
+    table = fit_coefficient_table(loader(filepath), dataset_processing.file_digest(filepath))
+
+    table_path = dataset_processing.cache_path(filepath, '_coefficients.npz')
+    dataset_processing.atomic_write(table_path, lambda file: np.savez(file, **table._asdict()))
+
+    return table
+
+
+def load_coefficient_table(filepath: str,
+                           loader: Callable[[str], Dict[str, List[float]]]) -> CoefficientTable:
+    """
+    Return the coefficient table of the impact dataset at <filepath>.
+
+    The table stored in the dataset's cache directory is used when it was fitted on the current
+    contents of the dataset; otherwise (no table, or the dataset has changed since) the table is
+    rebuilt with build_coefficient_table.
+    """
+    table_path = dataset_processing.cache_path(filepath, '_coefficients.npz')
+    if os.path.exists(table_path):
+        with np.load(table_path) as archive:
+            if str(archive['source_hash']) == dataset_processing.file_digest(filepath):
+                return CoefficientTable(archive['codes'], archive['coefficients'],
+                                        float(archive['centre']), float(archive['scale']),
+                                        str(archive['source_hash']))
+
+    return build_coefficient_table(filepath, loader)
+
+
+@instrumentation.timed('prediction.build_model_selection')
+def build_model_selection(filepath: str, loader: Callable[[str], Dict[str, List[float]]],
+                          workers: int = 1) -> models.ModelSelection:
+    """
+    Select the model of every country of the impact dataset at <filepath> (parsed with
+    <loader>) with models.select_models, cross-validating on <workers> processes, write the
+    selection to its .npz file in the dataset's cache directory and return it.
+    """
+    impact_data = loader(filepath)
+    selection = models.select_models(np.array(list(impact_data), dtype=str),
+                                     np.array(IMPACT_SEA_LEVELS, dtype=float),
+                                     np.array(list(impact_data.values()), dtype=float),
+                                     workers=workers,
+                                     source_hash=dataset_processing.file_digest(filepath))
+
+    selection_path = dataset_processing.cache_path(filepath, '_models.npz')
+    dataset_processing.atomic_write(selection_path,
+                                    lambda file: np.savez(file, **selection._asdict()))
+
+    return selection
+
+
+def load_model_selection(filepath: str, loader: Callable[[str], Dict[str, List[float]]],
+                         workers: int = 1) -> models.ModelSelection:
+    """
+    Return the model selection of the impact dataset at <filepath>.
+
+    The selection stored in the dataset's cache directory is used when it was made on the
+    current contents of the dataset among the currently registered models (and has every
+    field of models.ModelSelection); otherwise it is rebuilt with build_model_selection.
+    """
+    selection_path = dataset_processing.cache_path(filepath, '_models.npz')
+    if os.path.exists(selection_path):
+        with np.load(selection_path) as archive:
+            if (set(models.ModelSelection._fields) <= set(archive.files)
+                    and str(archive['source_hash']) == dataset_processing.file_digest(filepath)
+                    and archive['names'].tolist() == list(models.MODELS)):
+                return models.ModelSelection(archive['codes'], archive['names'],
+                                             archive['choices'], archive['scores'],
+                                             archive['parameters'], archive['widths'],
+                                             str(archive['source_hash']))
+
+    return build_model_selection(filepath, loader, workers)
+
+
+def land_loss_models(filepath_land_loss: str) -> models.ModelSelection:
+    """Return the model selection of the land loss dataset at <filepath_land_loss>."""
+    return load_model_selection(filepath_land_loss, dataset_processing.process_land_loss)
+
+
+def pop_displacement_models(filepath_pop_displacement: str) -> models.ModelSelection:
+    """Return the model selection of the population displacement dataset at
+    <filepath_pop_displacement>.
+    """
+    return load_model_selection(filepath_pop_displacement,
+                                dataset_processing.process_pop_displacement)
+
 
-    national_pop_displacement = []
-    for country_code in pop_displacement_data:
-        national_pop_displacement.append(pop_displacement_prediction(filepath_pop_displacement,
-                                                                     sea_level_rise, country_code))
+def land_loss_coefficients(filepath_land_loss: str) -> CoefficientTable:
+    """Return the coefficient table of the land loss dataset at <filepath_land_loss>."""
+    return load_coefficient_table(filepath_land_loss, dataset_processing.process_land_loss)
 
-    return national_pop_displacement
+
+def pop_displacement_coefficients(filepath_pop_displacement: str) -> CoefficientTable:
+    """Return the coefficient table of the population displacement dataset at
+    <filepath_pop_displacement>.
+    """
+    return load_coefficient_table(filepath_pop_displacement,
+                                  dataset_processing.process_pop_displacement)
 
 
+@instrumentation.timed('prediction.regression_points')
 def regression_points(x_list: List[float], y_list: List[float], x_future: List[float],
                       degree: int) -> List[float]:
     """
-    Return a dict of predicted (regressed) y-coordinates.
+    Return a list of predicted (regressed) y-coordinates.
 
     Preconditions:
       - degree >= 1
     """
-    x = np.array(x_list).reshape((-1, 1))
-    y = np.array(y_list)
-    x_future = np.array(x_future)
+    y_prediction = batch_regression_points(x_list, [y_list], x_future, degree)[0]
 
-    model = LinearRegression()
+    return y_prediction.tolist()
 
-    poly_regression = PolynomialFeatures(degree=degree)
-    poly_regression.fit(x)
 
-    x_poly = poly_regression.transform(x)
+@instrumentation.timed('prediction.batch_regression_points')
+def batch_regression_points(x_list: List[float], y_rows: np.ndarray, x_future: List[float],
+                            degree: int) -> np.ndarray:
+    """
+    Return an array of predicted (regressed) y-coordinates, one row per row of <y_rows>.
+    Every row of <y_rows> is fitted against the same <x_list> with a least-squares polynomial
+    of the given degree, and evaluated at every x in <x_future>.
 
-    model.fit(x_poly, y)
+    Preconditions:
+      - degree >= 1
+      - len(x_list) > degree
+      - all(len(row) == len(x_list) for row in y_rows)
+    """
+    coefficients, centre, scale = polynomial_coefficients(x_list, y_rows, degree)
 
-    x_prediction = poly_regression.transform(x_future.reshape(-1, 1))
-    y_prediction = model.predict(x_prediction)
+    return evaluate_polynomials(coefficients, centre, scale, x_future)
 
-    return [y_coord for y_coord in y_prediction]
+
+def polynomial_coefficients(x_list: List[float], y_rows: np.ndarray,
+                            degree: int) -> Tuple[np.ndarray, float, float]:
+    """
+    Return (coefficients, centre, scale) of the least-squares polynomials of the given degree
+    fitting each row of <y_rows> against <x_list>. Row i of coefficients holds the coefficients
+    (in increasing powers) of the fit of y_rows[i], in terms of (x - centre) / scale.
+
+    Since all rows share x-values, the Vandermonde matrix is built and pseudo-inverted once,
+    and all fits are solved in a single matrix product. The x-values are centred and scaled
+    before fitting so that high powers of large values (e.g. mm or tonnes) stay well conditioned.
+
+    Preconditions:
+      - degree >= 1
+      - len(x_list) > degree
+      - all(len(row) == len(x_list) for row in y_rows)
+    """
+    x = np.asarray(x_list, dtype=float)
+    y = np.asarray(y_rows, dtype=float).reshape((-1, len(x)))
+
+    centre = float(x.mean())
+    scale = float(np.abs(x - centre).max()) or 1.0
+
+    design = np.vander((x - centre) / scale, degree + 1, increasing=True)
+    coefficients = y @ np.linalg.pinv(design).T
+
+    return coefficients, centre, scale
+
+
+def evaluate_polynomials(coefficients: np.ndarray, centre: float, scale: float,
+                         x_future: List[float]) -> np.ndarray:
+    """
+    Return an array with the value of each polynomial (row of <coefficients>, as returned by
+    polynomial_coefficients) at every x in <x_future>, one row per polynomial.
+    """
+    x_prediction = np.vander((np.asarray(x_future, dtype=float) - centre) / scale,
+                             coefficients.shape[1], increasing=True)
+
+    return coefficients @ x_prediction.T
 
 
 def show_graph(x_existing: List[float], y_existing: List[float],
@@ -179,20 +1149,37 @@ def show_graph(x_existing: List[float], y_existing: List[float],
     Preconditions:
       - len(graph_titles) == 3
     """
+    build_graph(x_existing, y_existing, x_future, y_future, graph_titles).show()
+
+
+@instrumentation.timed('prediction.build_graph')
+def build_graph(x_existing: List[float], y_existing: List[float],
+                x_future: List[float], y_future: List[float],
+                graph_titles: List[str]) -> Any:
+    """
+    Return the plotly figure shown by show_graph.
+
+    Preconditions:
+      - len(graph_titles) == 3
+    """
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     fig = px.scatter(x=x_existing, y=y_existing, opacity=0.8)
 
     fig.add_traces(go.Scatter(x=x_future, y=y_future, name='Regression'))
     fig.update_layout(title=graph_titles[0], xaxis_title=graph_titles[1], yaxis_title=graph_titles[2])
 
-    fig.show()
+    return fig
 
 
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['numpy', 'sklearn', 'plotly', 'typing',
-                          'dataset_processing'],  # the names (strs) of imported modules
+        'extra-imports': ['numpy', 'plotly', 'typing', 'os', 'collections', 'threading',
+                          'concurrent.futures', 'dataset_processing', 'instrumentation',
+                          'models'],  # the names (strs) of imported modules
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 100,
         'disable': ['R1705', 'C0200']
@@ -0,0 +1,171 @@
+"""CSC110 Fall 2020: regression_test
+
+Module Description
+==================
+This module contains the tests of the regressions of the prediction module: the batched
+least-squares fits, checked against sklearn, the incremental sea level model, checked against
+a full refit, and the Monte Carlo uncertainty bands. Run them with
+python -m pytest regression_test.py.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+import csv
+import os
+from typing import Any, List
+
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import PolynomialFeatures
+
+import dataset_processing
+import prediction
+
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Data', 'data')
+PATH_SEA_LEVEL = os.path.join(DATA_DIRECTORY, 'csiro_recons_gmsl_yr_2015_csv.csv')
+PATH_CO2 = os.path.join(DATA_DIRECTORY, 'annual-co2-emissions-per-country_sample.csv')
+PATH_IMPACTS_SUMMARY = os.path.join(DATA_DIRECTORY, 'slr-impacts_nov2010-_1_.csv')
+
+
+def sklearn_points(x_list: List[float], y_list: List[float], x_future: List[float],
+                   degree: int) -> List[float]:
+    """Return the points at <x_future> of the polynomial regression of degree <degree> fitted
+    on <x_list> and <y_list> by sklearn, as the original regression_points did.
+    """
+    poly_regression = PolynomialFeatures(degree=degree)
+    x_poly = poly_regression.fit_transform(np.array(x_list).reshape(-1, 1))
+    model = LinearRegression().fit(x_poly, np.array(y_list))
+
+    return list(model.predict(poly_regression.transform(np.array(x_future).reshape(-1, 1))))
+
+
+def test_batched_regression_matches_sklearn() -> None:
+    """Test that the batched least-squares fits of prediction (polynomial_coefficients and
+    evaluate_polynomials) give the same numbers as sklearn for the fits the app makes: the
+    linear sea level regression against co2 emissions, and quadratic impact curves over the
+    IMPACT_SEA_LEVELS (here the global land loss and population displacement percentages of
+    the bundled slr-impacts summary, fitted together).
+    """
+    x_list, y_list = prediction.sea_level_observations(PATH_SEA_LEVEL, PATH_CO2)
+    x_future = list(np.linspace(x_list[-1], x_list[-1] + 87 * 35000, 87))
+    assert np.allclose(prediction.regression_points(list(x_list), list(y_list), x_future, 1),
+                       sklearn_points(list(x_list), list(y_list), x_future, 1),
+                       rtol=1e-9, atol=1e-9)
+
+    with open(PATH_IMPACTS_SUMMARY) as file:
+        y_rows = np.array([[float(cell) for cell in row[7:12]] for row in csv.reader(file)
+                           if row and row[0] == 'Global'])
+    sea_levels = list(prediction.IMPACT_SEA_LEVELS)
+    rises = list(np.linspace(0.0, 20000.0, 101))
+    coefficients, centre, scale = prediction.polynomial_coefficients(sea_levels, y_rows,
+                                                                     prediction.IMPACT_DEGREE)
+    batched = prediction.evaluate_polynomials(coefficients, centre, scale, rises)
+
+    assert len(y_rows) == 2
+    for y_row, batched_row in zip(y_rows, batched):
+        assert np.allclose(batched_row, sklearn_points(sea_levels, list(y_row), rises,
+                                                       prediction.IMPACT_DEGREE),
+                           rtol=1e-9, atol=1e-9)
+
+
+def full_refit_slope(filepath_sea_level: str, filepath_co2: str) -> float:
+    """Return the slope of the sea level regression fitted from scratch on the datasets, with
+    their co2 emissions and sea levels matched by year.
+    """
+    emissions = dataset_processing.read_co2_emissions(filepath_co2)
+    series = dataset_processing.parse_sea_level_series(filepath_sea_level)
+    co2 = dict(zip(emissions.years.tolist(), emissions.world.tolist()))
+    years = [year for year in series['year'].tolist() if year in co2 and year <= 2013]
+    y_list = [level for year, level in zip(series['year'].tolist(), series['gmsl'].tolist())
+              if year in years]
+
+    return float(np.polyfit([co2[year] for year in years], y_list, 1)[0])
+
+
+def test_incremental_refresh_matches_full_refit(tmp_path: Any) -> None:
+    """Test that SeaLevelModel.refresh gives the regression of a full refit as years are
+    appended to the datasets, and also after a year already fitted is rewritten.
+    """
+    filepath_sea_level = os.path.join(str(tmp_path), 'sea_level.csv')
+    filepath_co2 = os.path.join(str(tmp_path), 'co2.csv')
+    with open(PATH_SEA_LEVEL, newline='') as file:
+        sea_level_lines = file.read().splitlines(keepends=True)
+    with open(PATH_CO2, newline='') as file:
+        co2_lines = file.read().splitlines(keepends=True)
+
+    # start with the co2 rows up to 1950 and the sea level rows of 1880 to 1900 ...
+    with open(filepath_sea_level, 'w', newline='') as file:
+        file.writelines(sea_level_lines[:22])
+    with open(filepath_co2, 'w', newline='') as file:
+        file.writelines(co2_lines[:1] + [line for line in co2_lines[1:]
+                                         if int(line.split(',')[2]) <= 1950])
+    model = prediction.sea_level_model(filepath_sea_level, filepath_co2)
+    assert model.observations()[0].tolist() == list(range(1880, 1901))
+    assert np.isclose(model.slope(), full_refit_slope(filepath_sea_level, filepath_co2),
+                      rtol=1e-9)
+
+    # ... then append the rest of both
+    with open(filepath_sea_level, 'a', newline='') as file:
+        file.writelines(sea_level_lines[22:])
+    with open(filepath_co2, 'a', newline='') as file:
+        file.writelines(line for line in co2_lines[1:] if int(line.split(',')[2]) > 1950)
+    assert model.refresh() == 113
+    assert model.refresh() == 0
+    assert model.observations()[0].tolist() == list(range(1880, 2014))
+    assert np.isclose(model.slope(), full_refit_slope(filepath_sea_level, filepath_co2),
+                      rtol=1e-9)
+
+    # rewriting the sea level of a year already fitted refits the regression
+    with open(filepath_sea_level, 'w', newline='') as file:
+        file.writelines(sea_level_lines[:2] + ['1881-06-15,0.0,25.0\n'] + sea_level_lines[3:])
+    assert model.refresh() == 1
+    assert model.observations()[2][1] == 0.0
+    assert np.isclose(model.slope(), full_refit_slope(filepath_sea_level, filepath_co2),
+                      rtol=1e-9)
+
+
+
+def test_uncertainty_is_seeded_and_worker_independent(tmp_path: Any) -> None:
+    """Test that the Monte Carlo bands of uncertainty_prediction depend on the seed only, not
+    on the number of worker processes, and that they are ordered by percentile.
+    """
+    filepath_impacts = os.path.join(str(tmp_path), 'impacts.csv')
+    with open(filepath_impacts, 'w') as file:
+        file.write('Code,Country,1m,2m,3m,4m,5m\n'
+                   'ARG,Argentina,0.12,0.25,0.4,0.56,0.73\n'
+                   'BHS,Bahamas,5.06,11.3,19.1,26.0,32.3\n')
+    filepaths = [PATH_SEA_LEVEL, PATH_CO2, filepath_impacts, filepath_impacts]
+    draws = prediction.MONTE_CARLO_CHUNK * 2 + 1
+
+    serial = prediction.uncertainty_prediction(*filepaths, 2100, 35000.0, draws=draws, seed=7)
+    parallel = prediction.uncertainty_prediction(*filepaths, 2100, 35000.0, draws=draws, seed=7,
+                                                 workers=3)
+    reseeded = prediction.uncertainty_prediction(*filepaths, 2100, 35000.0, draws=draws, seed=8)
+
+    for serial_field, parallel_field in zip(serial, parallel):
+        assert np.array_equal(serial_field, parallel_field)
+    assert not np.array_equal(serial.sea_level_rise, reseeded.sea_level_rise)
+    assert np.all(np.diff(serial.sea_level_rise) > 0)
+    assert np.all(np.diff(serial.sea_level_points, axis=0) >= 0)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['csv', 'os', 'typing', 'numpy', 'sklearn.linear_model',
+                          'sklearn.preprocessing', 'dataset_processing', 'prediction'],
+        'allowed-io': ['test_batched_regression_matches_sklearn',
+                       'test_incremental_refresh_matches_full_refit',
+                       'test_uncertainty_is_seeded_and_worker_independent'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,203 @@
+"""CSC110 Fall 2020: rendering
+
+Module Description
+==================
+This module contains the code to write the project's figures (the sea level graph, the
+animated graph and the maps) to static HTML and PNG files instead of showing them in a
+browser, for generating reports without the GUI.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+import os
+import time
+from typing import Any, List, NamedTuple, Tuple
+
+
+# formats FigureRenderer can write
+RENDER_FORMATS = ['html', 'png']
+
+
+class RenderReport(NamedTuple):
+    """The file written for one figure in one format, its size in bytes, and the seconds taken
+    to write it.
+    """
+    path: str
+    size: int
+    seconds: float
+
+
+class FigureRenderer:
+    """Write plotly figures to files in one output directory.
+
+    Every HTML file references a single plotly.min.js copied once into the output directory,
+    instead of each embedding the ~3MB bundle, so the files work offline. PNG files are queued
+    and written together by flush(), so that one image export process renders the whole batch.
+    A renderer can be used as a context manager, which flushes it on exit.
+
+    Instance Attributes:
+      - output_directory: the directory the files are written to
+      - reports: a report for every file written so far, in the order they were written
+    """
+    output_directory: str
+    reports: List[RenderReport]
+    _queued_images: List[Tuple[Any, str]]
+
+    def __init__(self, output_directory: str) -> None:
+        self.output_directory = output_directory
+        self.reports = []
+        self._queued_images = []
+
+        os.makedirs(output_directory, exist_ok=True)
+
+    def __enter__(self) -> 'FigureRenderer':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.flush()
+
+    def render(self, fig: Any, name: str, formats: Tuple[str, ...] = ('html',)) -> None:
+        """Write the plotly figure <fig> to <name>.<format> in the output directory, for every
+        format in <formats>. HTML files are written immediately and PNG files on the next flush.
+
+        Preconditions:
+          - all(file_format in RENDER_FORMATS for file_format in formats)
+        """
+        path = os.path.join(self.output_directory, name)
+
+        if 'html' in formats:
+            started = time.perf_counter()
+            fig.write_html(path + '.html', include_plotlyjs='directory', full_html=True)
+            self._report(path + '.html', time.perf_counter() - started)
+
+        if 'png' in formats:
+            self._queued_images.append((fig, path + '.png'))
+
+    def flush(self) -> None:
+        """Write every queued PNG file in a single batch (which needs the kaleido package)."""
+        if not self._queued_images:
+            return
+
+        import plotly.io as pio
+
+        figures = [fig for fig, _ in self._queued_images]
+        paths = [path for _, path in self._queued_images]
+        self._queued_images = []
+
+        started = time.perf_counter()
+        if hasattr(pio, 'write_images'):
+            pio.write_images(figures, paths)
+        else:
+            for fig, path in zip(figures, paths):
+                fig.write_image(path)
+        seconds = (time.perf_counter() - started) / len(paths)
+
+        for path in paths:
+            self._report(path, seconds)
+
+    def summary(self) -> str:
+        """Return a table of the size and render time of every file written so far, with
+        their totals.
+        """
+        lines = [f'{"size [KB]":>10} | {"time [ms]":>10} | file']
+        for report in self.reports:
+            lines.append(f'{report.size / 1024:>10.1f} | {report.seconds * 1000:>10.1f} | '
+                         + os.path.relpath(report.path, self.output_directory))
+
+        bundle = os.path.join(self.output_directory, 'plotly.min.js')
+        if os.path.exists(bundle):
+            lines.append(f'{os.path.getsize(bundle) / 1024:>10.1f} | {"":>10} | plotly.min.js '
+                         '(shared by every HTML file)')
+
+        total_size = sum(report.size for report in self.reports)
+        total_seconds = sum(report.seconds for report in self.reports)
+        lines.append(f'{total_size / 1024:>10.1f} | {total_seconds * 1000:>10.1f} | '
+                     f'total of {len(self.reports)} files')
+
+        return '\n'.join(lines)
+
+    def _report(self, path: str, seconds: float) -> None:
+        """Record that the file at <path> was written in <seconds>."""
+        self.reports.append(RenderReport(path, os.path.getsize(path), seconds))
+
+
+def render_scenario(renderer: FigureRenderer, paths: List[str], filepath_country_to_code: str,
+                    year_input: int, co2_input: float,
+                    formats: Tuple[str, ...] = ('html',)) -> None:
+    """Render every figure the GUI shows for the scenario (<year_input>, <co2_input>) with
+    <renderer>: the sea level graph, the animated graph and both maps.
+    <paths> are the sea level, co2, land loss and population displacement dataset paths.
+
+    Preconditions:
+        - year_input > 2013
+        - co2_input >= 1
+    """
+    import animation
+    import dataset_processing
+    import maps
+    import prediction
+
+    scenario = prediction.scenario_prediction(*paths, year_input, co2_input)
+    total_co2 = (year_input - 2013) * co2_input
+    name = f'{year_input}_{co2_input:g}_'
+
+    renderer.render(prediction.build_sea_level_graph(paths[0], paths[1], total_co2,
+                                                     scenario.sea_level_points),
+                    name + 'sea_level', formats)
+    renderer.render(animation.build_animated_graph(scenario.sea_level_points),
+                    name + 'animation', formats)
+    country_index = dataset_processing.load_country_index(filepath_country_to_code)
+    renderer.render(maps.build_map(scenario.land_loss, scenario.land_loss_codes, 'Land Lost',
+                                   country_index),
+                    name + 'land_loss', formats)
+    renderer.render(maps.build_map(scenario.pop_displacement, scenario.pop_displacement_codes,
+                                   'Population Displaced', country_index),
+                    name + 'pop_displacement', formats)
+
+
+def render_scenario_comparison(renderer: FigureRenderer, paths: List[str],
+                               filepath_country_to_code: str, scenarios: List[Tuple[int, float]],
+                               formats: Tuple[str, ...] = ('html',)) -> None:
+    """Render one land loss map and one population displacement map with a slider over
+    <scenarios>, a list of (target year, co2 per year) pairs, with <renderer>.
+    <paths> are the sea level, co2, land loss and population displacement dataset paths.
+
+    Preconditions:
+        - scenarios != []
+        - all(year_input > 2013 and co2_input >= 1 for year_input, co2_input in scenarios)
+    """
+    import dataset_processing
+    import maps
+    import numpy as np
+    import prediction
+
+    years, co2_per_year = np.array(scenarios, dtype=float).T
+    grid = prediction.evaluate_grid(years, co2_per_year, *paths)
+    country_index = dataset_processing.load_country_index(filepath_country_to_code)
+    labels = [f'{year_input} at {co2_input:g} t/yr' for year_input, co2_input in scenarios]
+
+    renderer.render(maps.build_scenario_map(grid.land_loss, grid.land_loss_codes, labels,
+                                            'Land Lost', country_index),
+                    'land_loss_comparison', formats)
+    renderer.render(maps.build_scenario_map(grid.pop_displacement, grid.pop_displacement_codes,
+                                            labels, 'Population Displaced', country_index),
+                    'pop_displacement_comparison', formats)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'time', 'typing', 'plotly.io', 'animation', 'dataset_processing',
+                          'maps', 'numpy', 'prediction'],  # the names (strs) of imported modules
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200', 'C0415']
+    })
@@ -0,0 +1,263 @@
+"""CSC110 Fall 2020: result_store
+
+Module Description
+==================
+This module contains the persistent store of scenario results, so that scenario sweeps and
+GUI clicks are computed once and can be queried later without recomputing them.
+
+Results are kept in an SQLite database, one row per scenario, keyed by (model version,
+dataset hash, target year, co2 per year): the model version names the prediction code and
+country curves that produced the results, and the dataset hash the contents of the datasets
+they were computed from, so results of other models or datasets are never mixed up. Each row
+holds the sea level rise, the national land loss and population displacement percentages
+(as float64 blobs, in the order of the country codes stored once per key) and optionally the
+sea level trajectory. Scenarios are indexed on their key and on their sea level rise, for
+range queries such as all scenarios with a rise between 500 and 800 mm.
+
+Inserts are batched, STORE_BATCH_SIZE rows per transaction, so sweeps of millions of
+scenarios can be written quickly.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+import hashlib
+import itertools
+import json
+import sqlite3
+import threading
+from typing import Any, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+import dataset_processing
+
+
+# version of the prediction code; bump it whenever the same inputs start giving other results,
+# so that results stored by older code are not returned
+MODEL_VERSION = 1
+
+# rows inserted per transaction
+STORE_BATCH_SIZE = 10000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS scenarios (
+    model_version TEXT NOT NULL,
+    dataset_hash TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    co2_per_year REAL NOT NULL,
+    sea_level_rise REAL NOT NULL,
+    sea_level_points BLOB,
+    land_loss BLOB NOT NULL,
+    pop_displacement BLOB NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS scenarios_by_key
+    ON scenarios (model_version, dataset_hash, year, co2_per_year);
+CREATE INDEX IF NOT EXISTS scenarios_by_rise
+    ON scenarios (model_version, dataset_hash, sea_level_rise);
+CREATE TABLE IF NOT EXISTS countries (
+    model_version TEXT NOT NULL,
+    dataset_hash TEXT NOT NULL,
+    quantity TEXT NOT NULL,
+    codes TEXT NOT NULL,
+    PRIMARY KEY (model_version, dataset_hash, quantity)
+);
+'''
+
+
+class StoreKey(NamedTuple):
+    """The model version and dataset hash a set of stored results was computed with."""
+    model_version: str
+    dataset_hash: str
+
+
+class StoredScenario(NamedTuple):
+    """A stored scenario result. <sea_level_points> is None when its trajectory was not
+    stored; <land_loss> and <pop_displacement> are in the order of <land_loss_codes> and
+    <pop_displacement_codes>.
+    """
+    year: int
+    co2_per_year: float
+    sea_level_rise: float
+    sea_level_points: Optional[np.ndarray]
+    land_loss: np.ndarray
+    pop_displacement: np.ndarray
+    land_loss_codes: List[str]
+    pop_displacement_codes: List[str]
+
+
+class ResultStore:
+    """A store of scenario results in the SQLite database at a given path, which is created if
+    it does not exist. It can be shared between threads.
+
+    Instance Attributes:
+      - filepath: the path of the database
+    """
+    filepath: str
+    _connection: sqlite3.Connection
+    _lock: threading.Lock
+
+    def __init__(self, filepath: str) -> None:
+        self.filepath = filepath
+        self._connection = sqlite3.connect(filepath, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.executescript(SCHEMA)
+
+    def __enter__(self) -> 'ResultStore':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the database."""
+        self._connection.close()
+
+    def put(self, key: StoreKey, years: np.ndarray, co2_per_year: np.ndarray,
+            sea_level_rise: np.ndarray, land_loss: np.ndarray, pop_displacement: np.ndarray,
+            land_loss_codes: List[str], pop_displacement_codes: List[str],
+            sea_level_points: Optional[List[np.ndarray]] = None) -> int:
+        """Store the results of every scenario (years[i], co2_per_year[i]) under <key>,
+        replacing any stored before, and return the number of scenarios stored.
+
+        Row i of <land_loss> and <pop_displacement> holds the national results of scenario i,
+        in the order of <land_loss_codes> and <pop_displacement_codes>. sea_level_points[i],
+        if given, is its sea level trajectory.
+        """
+        land_loss = np.ascontiguousarray(land_loss, dtype='<f8')
+        pop_displacement = np.ascontiguousarray(pop_displacement, dtype='<f8')
+        rows = ((key.model_version, key.dataset_hash, int(years[i]), float(co2_per_year[i]),
+                 float(sea_level_rise[i]),
+                 None if sea_level_points is None
+                 else np.asarray(sea_level_points[i], dtype='<f8').tobytes(),
+                 land_loss[i].tobytes(), pop_displacement[i].tobytes())
+                for i in range(len(years)))
+
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO countries VALUES (?, ?, ?, ?)',
+                    [(key.model_version, key.dataset_hash, 'land_loss',
+                      json.dumps([str(code) for code in land_loss_codes])),
+                     (key.model_version, key.dataset_hash, 'pop_displacement',
+                      json.dumps([str(code) for code in pop_displacement_codes]))])
+
+            for _ in range(0, len(years), STORE_BATCH_SIZE):
+                batch = list(itertools.islice(rows, STORE_BATCH_SIZE))
+                with self._connection:
+                    self._connection.executemany(
+                        'INSERT OR REPLACE INTO scenarios VALUES (?, ?, ?, ?, ?, ?, ?, ?)', batch)
+
+        return len(years)
+
+    def get(self, key: StoreKey, year_input: int, co2_input: float) -> Optional[StoredScenario]:
+        """Return the scenario (<year_input>, <co2_input>) stored under <key>, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT year, co2_per_year, sea_level_rise, sea_level_points, land_loss, '
+                'pop_displacement FROM scenarios WHERE model_version = ? AND dataset_hash = ? '
+                'AND year = ? AND co2_per_year = ?',
+                (key.model_version, key.dataset_hash, int(year_input), float(co2_input))
+            ).fetchone()
+
+        return None if row is None else stored_scenario(row, self._codes(key))
+
+    def stored(self, key: StoreKey, scenarios: List[Tuple[int, float]]) -> Set[Tuple[int, float]]:
+        """Return the (year, co2 per year) scenarios of <scenarios> stored under <key>."""
+        with self._lock:
+            with self._connection:
+                self._connection.execute('CREATE TEMP TABLE IF NOT EXISTS wanted '
+                                         '(year INTEGER, co2_per_year REAL)')
+                self._connection.execute('DELETE FROM wanted')
+                self._connection.executemany('INSERT INTO wanted VALUES (?, ?)',
+                                             [(int(year), float(co2)) for year, co2 in scenarios])
+                found = self._connection.execute(
+                    'SELECT wanted.year, wanted.co2_per_year FROM wanted JOIN scenarios '
+                    'ON scenarios.model_version = ? AND scenarios.dataset_hash = ? '
+                    'AND scenarios.year = wanted.year '
+                    'AND scenarios.co2_per_year = wanted.co2_per_year',
+                    (key.model_version, key.dataset_hash)).fetchall()
+
+        return set(found)
+
+    def query_rise(self, key: StoreKey, low: float, high: float,
+                   limit: Optional[int] = None) -> Iterator[StoredScenario]:
+        """Yield the scenarios stored under <key> whose sea level rise is between <low> and
+        <high> mm (inclusive), in increasing order of rise, at most <limit> of them.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT year, co2_per_year, sea_level_rise, sea_level_points, land_loss, '
+                'pop_displacement FROM scenarios WHERE model_version = ? AND dataset_hash = ? '
+                'AND sea_level_rise BETWEEN ? AND ? ORDER BY sea_level_rise LIMIT ?',
+                (key.model_version, key.dataset_hash, float(low), float(high),
+                 -1 if limit is None else int(limit))).fetchall()
+
+        codes = self._codes(key)
+        for row in rows:
+            yield stored_scenario(row, codes)
+
+    def count(self, key: StoreKey) -> int:
+        """Return the number of scenarios stored under <key>."""
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM scenarios WHERE model_version = ? AND dataset_hash = ?',
+                key).fetchone()[0]
+
+    def _codes(self, key: StoreKey) -> Tuple[List[str], List[str]]:
+        """Return the land loss and population displacement country codes stored under
+        <key>.
+        """
+        with self._lock:
+            codes = dict(self._connection.execute(
+                'SELECT quantity, codes FROM countries WHERE model_version = ? '
+                'AND dataset_hash = ?', key).fetchall())
+
+        return json.loads(codes['land_loss']), json.loads(codes['pop_displacement'])
+
+
+def stored_scenario(row: Tuple, codes: Tuple[List[str], List[str]]) -> StoredScenario:
+    """Return the StoredScenario of the (year, co2_per_year, sea_level_rise, sea_level_points,
+    land_loss, pop_displacement) database <row>, whose countries have the land loss and
+    population displacement <codes>.
+    """
+    return StoredScenario(row[0], row[1], row[2],
+                          None if row[3] is None else np.frombuffer(row[3], dtype='<f8'),
+                          np.frombuffer(row[4], dtype='<f8'), np.frombuffer(row[5], dtype='<f8'),
+                          codes[0], codes[1])
+
+
+def store_key(paths: List[str], curves: str = 'quadratic') -> StoreKey:
+    """Return the key of the results computed from the sea level, co2, land loss and population
+    displacement datasets at <paths> with the country curves <curves>.
+
+    The dataset hash combines the SHA-256 digests of the datasets, each computed at most once
+    per version of its file.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(dataset_processing.load_dataset(path, dataset_processing.file_digest)
+                      .encode())
+
+    return StoreKey(f'{MODEL_VERSION}/{curves}', digest.hexdigest())
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['hashlib', 'itertools', 'json', 'sqlite3', 'threading', 'typing', 'numpy',
+                          'dataset_processing'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
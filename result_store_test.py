@@ -0,0 +1,101 @@
+"""CSC110 Fall 2020: result_store_test
+
+Module Description
+==================
+This module contains the tests of the persistent store of scenario results. Each test uses a
+new database in a temporary directory. Run them with python -m pytest result_store_test.py.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+import os
+from typing import Any
+
+import numpy as np
+
+import result_store
+
+
+KEY = result_store.StoreKey('1/quadratic', 'hash')
+
+
+def test_put_get_query_rise(tmp_path: Any) -> None:
+    """Test that stored scenarios are returned unchanged by get, stored and query_rise."""
+    years = np.array([2050, 2100, 2150])
+    co2_per_year = np.array([1000.0, 35000.0, 20000.0])
+    rises = np.array([100.0, 900.0, 600.0])
+    land_loss = np.array([[0.1, 1.0], [0.9, 9.0], [0.6, 6.0]])
+    pop_displacement = np.array([[0.2], [1.8], [1.2]])
+    trajectories = [np.linspace(0.0, rise, year - 2013) for year, rise in zip(years, rises)]
+
+    with result_store.ResultStore(os.path.join(str(tmp_path), 'results.db')) as store:
+        assert store.put(KEY, years, co2_per_year, rises, land_loss, pop_displacement,
+                         ['ARG', 'BHS'], ['ARG'], trajectories) == 3
+
+        scenario = store.get(KEY, 2100, 35000.0)
+        assert (scenario.year, scenario.co2_per_year, scenario.sea_level_rise) == (2100, 35000.0,
+                                                                                   900.0)
+        assert np.array_equal(scenario.sea_level_points, trajectories[1])
+        assert np.array_equal(scenario.land_loss, land_loss[1])
+        assert np.array_equal(scenario.pop_displacement, pop_displacement[1])
+        assert (scenario.land_loss_codes, scenario.pop_displacement_codes) == (['ARG', 'BHS'],
+                                                                               ['ARG'])
+        assert store.get(KEY, 2100, 1000.0) is None
+
+        assert store.stored(KEY, [(2050, 1000.0), (2050, 2000.0)]) == {(2050, 1000.0)}
+        assert [(scenario.year, scenario.sea_level_rise)
+                for scenario in store.query_rise(KEY, 500.0, 900.0)] == [(2150, 600.0),
+                                                                        (2100, 900.0)]
+        assert len(list(store.query_rise(KEY, 0.0, 1000.0, limit=2))) == 2
+
+        # storing a scenario again replaces it
+        store.put(KEY, years[:1], co2_per_year[:1], np.array([150.0]), land_loss[:1],
+                  pop_displacement[:1], ['ARG', 'BHS'], ['ARG'])
+        assert store.count(KEY) == 3
+        assert store.get(KEY, 2050, 1000.0).sea_level_rise == 150.0
+        assert store.get(KEY, 2050, 1000.0).sea_level_points is None
+
+
+def test_store_key_invalidation(tmp_path: Any) -> None:
+    """Test that the store key changes with the contents of every dataset and with the country
+    curves, so results stored under an older key are not returned.
+    """
+    paths = [os.path.join(str(tmp_path), name) for name in ['sea_level.csv', 'co2.csv',
+                                                            'land_loss.csv', 'pop.csv']]
+    for path in paths:
+        with open(path, 'w') as file:
+            file.write('Code,Country,1m\nARG,Argentina,0.12\n')
+
+    key = result_store.store_key(paths)
+    assert result_store.store_key(paths) == key
+    assert result_store.store_key(paths, 'bounded') != key
+
+    with result_store.ResultStore(os.path.join(str(tmp_path), 'results.db')) as store:
+        store.put(key, np.array([2100]), np.array([35000.0]), np.array([900.0]),
+                  np.array([[0.9]]), np.array([[1.8]]), ['ARG'], ['ARG'])
+
+        for path in paths:
+            with open(path, 'a') as file:
+                file.write('BHS,Bahamas,5.06\n')
+            new_key = result_store.store_key(paths)
+            assert new_key != key
+            assert store.get(new_key, 2100, 35000.0) is None
+            key = new_key
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'typing', 'numpy', 'result_store'],
+        'allowed-io': ['test_store_key_invalidation'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
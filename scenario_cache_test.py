@@ -0,0 +1,90 @@
+"""CSC110 Fall 2020: scenario_cache_test
+
+Module Description
+==================
+This module contains the tests of the scenario cache of the prediction module, which the GUI
+buttons share. Run them with python -m pytest scenario_cache_test.py.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+import os
+from typing import Any
+
+import prediction
+
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Data', 'data')
+PATH_SEA_LEVEL = os.path.join(DATA_DIRECTORY, 'csiro_recons_gmsl_yr_2015_csv.csv')
+PATH_CO2 = os.path.join(DATA_DIRECTORY, 'annual-co2-emissions-per-country_sample.csv')
+
+
+def scenario(sea_level_rise: float) -> prediction.Scenario:
+    """Return a Scenario with the sea level rise <sea_level_rise> and no countries."""
+    return prediction.Scenario([0.0, sea_level_rise], sea_level_rise, [], [], [], [])
+
+
+def test_hits_misses_and_eviction() -> None:
+    """Test that the cache counts hits and misses, and evicts the least recently used
+    scenario when full.
+    """
+    cache = prediction.ScenarioCache(maxsize=2)
+    assert cache.get('a') is None
+    cache.put('a', scenario(1.0))
+    cache.put('b', scenario(2.0))
+    assert cache.get('a').sea_level_rise == 1.0
+
+    # 'b' is now the least recently used, so it is evicted first
+    cache.put('c', scenario(3.0))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.info() == {'hits': 3, 'misses': 2, 'size': 2, 'maxsize': 2}
+
+    cache.resize(1)
+    assert cache.get('a') is None
+    assert cache.get('c').sea_level_rise == 3.0
+
+    cache.clear()
+    assert cache.info() == {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 1}
+
+
+def test_scenario_prediction_cache(tmp_path: Any) -> None:
+    """Test that scenario_prediction answers a repeated scenario from the cache, and computes
+    it again for other curves or once a dataset has changed.
+    """
+    filepath_impacts = os.path.join(str(tmp_path), 'impacts.csv')
+    with open(filepath_impacts, 'w') as file:
+        file.write('Code,Country,1m,2m,3m,4m,5m\nARG,Argentina,0.12,0.25,0.4,0.56,0.73\n')
+    filepaths = [PATH_SEA_LEVEL, PATH_CO2, filepath_impacts, filepath_impacts]
+    cache = prediction.ScenarioCache()
+
+    first = prediction.scenario_prediction(*filepaths, 2100, 35000.0, cache=cache)
+    assert prediction.scenario_prediction(*filepaths, 2100, 35000, cache=cache) is first
+    assert prediction.scenario_prediction(*filepaths, 2100, 35000.0, cache=cache,
+                                          curves='bounded') is not first
+    assert cache.info()['hits'] == 1 and cache.info()['misses'] == 2
+
+    with open(filepath_impacts, 'a') as file:
+        file.write('BHS,Bahamas,5.06,11.3,19.1,26.0,32.3\n')
+    changed = prediction.scenario_prediction(*filepaths, 2100, 35000.0, cache=cache)
+    assert changed.land_loss_codes == ['ARG', 'BHS']
+    assert changed.sea_level_rise == first.sea_level_rise
+    assert cache.info()['misses'] == 3
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'typing', 'prediction'],
+        'allowed-io': ['test_scenario_prediction_cache'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,541 @@
+"""CSC110 Fall 2020: service
+
+Module Description
+==================
+This module contains a local HTTP service answering prediction queries, so that other tools
+can get projections without the GUI. Run it with python -m slr serve [--port 8110].
+
+The datasets are loaded and every model fitted once at startup; requests are answered from
+that in-memory state. Endpoints (year and co2 are the target year and co2 per year in metric
+tonnes, with the same constraints as in the GUI):
+
+    GET  /sea-level?year=2100&co2=35000   the sea level trajectory and its rise
+    GET  /countries?year=2100&co2=35000   every country's land loss and population displaced %
+    POST /batch  {"scenarios": [[2100, 35000], ...]}   rise and country stats of many scenarios
+    GET  /metrics                         request counts, latencies, cache and batching stats
+    GET  /health
+
+The country curves are the quadratic fits by default, or the monotone curves capped at 100%
+with python -m slr serve --curves bounded (see prediction.evaluate_grid).
+
+Responses of GET requests are cached. Concurrent /countries requests are batched into one
+evaluation of the country curves, and at most a fixed number of requests are handled at once;
+requests beyond a waiting limit are rejected with 503.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+import asyncio
+import collections
+import json
+import time
+import traceback
+import urllib.parse
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import dataset_processing
+import prediction
+
+
+# requests handled at once, and requests allowed to wait for a slot before getting a 503
+MAX_CONCURRENT_REQUESTS = 32
+MAX_WAITING_REQUESTS = 256
+
+# how long (in s) a /countries request waits for others to be evaluated with, and the most
+# scenarios evaluated together
+BATCH_WINDOW = 0.002
+MAX_BATCH_SIZE = 1024
+
+# number of GET responses kept by the response cache
+RESPONSE_CACHE_SIZE = 1024
+
+# latencies kept per endpoint for the percentiles reported by /metrics
+LATENCY_WINDOW = 2048
+
+# latest target year and largest co2 per year accepted, so every trajectory and rise stays a
+# reasonable size, and most scenarios of a /batch request
+MAX_YEAR = 10000
+MAX_CO2_PER_YEAR = 1e12
+MAX_BATCH_SCENARIOS = 10000
+
+# most bytes of a request body, and seconds an idle keep-alive connection is kept open
+MAX_BODY_SIZE = 1 << 20
+IDLE_TIMEOUT = 30.0
+
+# most header lines of a request, and most bytes they take together
+MAX_HEADER_COUNT = 100
+MAX_HEADER_SIZE = 1 << 14
+
+# endpoints the metrics are kept for; requests to other paths are counted together
+ENDPOINTS = ['/sea-level', '/countries', '/batch', '/metrics', '/health']
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 431: 'Request Header Fields Too Large',
+                500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class RequestError(Exception):
+    """An error in a request, answered with <status> and a JSON message."""
+    status: int
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class ModelState:
+    """The datasets and fitted models every request is answered from, loaded once, with the
+    country curves named by one of prediction.IMPACT_CURVES.
+
+    Instance Attributes:
+      - x_last: the last observed co2 emissions, where every sea level trajectory starts
+      - coefficients, centre, scale: the linear sea level regression, as returned by
+        prediction.polynomial_coefficients
+      - slope: the sea level regression's mm of sea level per metric tonne of co2
+      - land_loss_table, pop_displacement_table: the fitted country curves
+    """
+    x_last: float
+    coefficients: np.ndarray
+    centre: float
+    scale: float
+    slope: float
+    land_loss_table: Any
+    pop_displacement_table: Any
+    _curve_grid: Callable[[Any, np.ndarray], np.ndarray]
+
+    def __init__(self, filepath_sea_level: str, filepath_co2: str, filepath_land_loss: str,
+                 filepath_pop_displacement: str, curves: str = 'quadratic') -> None:
+        x_list, y_list = prediction.sea_level_observations(filepath_sea_level, filepath_co2)
+        self.x_last = float(x_list[-1])
+        self.coefficients, self.centre, self.scale = prediction.polynomial_coefficients(
+            x_list, [y_list], 1)
+        self.slope = float(self.coefficients[0, 1]) / self.scale
+        land_loss_loader, pop_displacement_loader, self._curve_grid = (
+            prediction.impact_curve_functions(curves))
+        self.land_loss_table = land_loss_loader(filepath_land_loss)
+        self.pop_displacement_table = pop_displacement_loader(filepath_pop_displacement)
+
+    def sea_level_points(self, year_input: int, co2_input: float) -> List[float]:
+        """Return the sea level trajectory prediction.sea_level_prediction gives for reaching
+        <year_input> while emitting <co2_input> metric tonnes of co2 per year.
+        """
+        years = year_input - 2013
+        x_future = np.linspace(self.x_last, self.x_last + years * co2_input, years)
+
+        return prediction.evaluate_polynomials(self.coefficients, self.centre, self.scale,
+                                               x_future)[0].tolist()
+
+    def evaluate(self, years: np.ndarray,
+                 co2_per_year: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the sea level rise, land loss and population displacement of every scenario
+        (years[i], co2_per_year[i]), as prediction.evaluate_grid does.
+        """
+        steps = years - 2013
+        sea_level_rise = np.where(steps >= 2, self.slope * steps * co2_per_year, 0.0)
+
+        return (sea_level_rise,
+                self._curve_grid(self.land_loss_table, sea_level_rise),
+                self._curve_grid(self.pop_displacement_table, sea_level_rise))
+
+
+class ScenarioBatcher:
+    """Evaluate the scenarios of concurrent requests together.
+
+    Each scenario waits up to BATCH_WINDOW seconds for others, then every waiting scenario is
+    evaluated with one ModelState.evaluate call.
+
+    Instance Attributes:
+      - batches: the number of batches evaluated so far
+      - scenarios: the number of scenarios evaluated so far
+      - largest_batch: the most scenarios evaluated in one batch
+    """
+    batches: int
+    scenarios: int
+    largest_batch: int
+    _state: ModelState
+    _window: float
+    _waiting: List[Tuple[int, float, asyncio.Future]]
+    _flush_handle: Optional[asyncio.TimerHandle]
+
+    def __init__(self, state: ModelState, window: float = BATCH_WINDOW) -> None:
+        self.batches = 0
+        self.scenarios = 0
+        self.largest_batch = 0
+        self._state = state
+        self._window = window
+        self._waiting = []
+        self._flush_handle = None
+
+    async def evaluate(self, year_input: int, co2_input: float) -> Tuple[float, List[float],
+                                                                         List[float]]:
+        """Return the sea level rise, land loss and population displacement of the scenario
+        (<year_input>, <co2_input>), evaluated with the other scenarios waiting alongside it.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.append((year_input, co2_input, future))
+
+        if len(self._waiting) >= MAX_BATCH_SIZE:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._window, self.flush)
+
+        return await future
+
+    def flush(self) -> None:
+        """Evaluate every waiting scenario now."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        waiting, self._waiting = self._waiting, []
+        if not waiting:
+            return
+
+        years = np.array([scenario[0] for scenario in waiting], dtype=float)
+        co2_per_year = np.array([scenario[1] for scenario in waiting], dtype=float)
+        sea_level_rise, land_loss, pop_displacement = self._state.evaluate(years, co2_per_year)
+
+        for i, (_, _, future) in enumerate(waiting):
+            if not future.done():
+                future.set_result((float(sea_level_rise[i]), land_loss[i].tolist(),
+                                   pop_displacement[i].tolist()))
+
+        self.batches += 1
+        self.scenarios += len(waiting)
+        self.largest_batch = max(self.largest_batch, len(waiting))
+
+
+class PredictionService:
+    """The HTTP service: routes requests, caches responses and keeps the metrics.
+
+    Instance Attributes:
+      - state: the warm models requests are answered from
+      - batcher: the batcher of /countries scenarios
+      - started: when the service started, from time.time()
+    """
+    state: ModelState
+    batcher: ScenarioBatcher
+    started: float
+    _slots: asyncio.Semaphore
+    _waiting: int
+    _in_flight: int
+    _rejected: int
+    _cache: 'collections.OrderedDict[Tuple, bytes]'
+    _cache_size: int
+    _cache_hits: int
+    _cache_misses: int
+    _counts: Dict[str, int]
+    _errors: Dict[str, int]
+    _latencies: Dict[str, Deque[float]]
+
+    def __init__(self, state: ModelState, max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+                 cache_size: int = RESPONSE_CACHE_SIZE, batch_window: float = BATCH_WINDOW) -> None:
+        self.state = state
+        self.batcher = ScenarioBatcher(state, batch_window)
+        self.started = time.time()
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        self._in_flight = 0
+        self._rejected = 0
+        self._cache = collections.OrderedDict()
+        self._cache_size = cache_size
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._counts = collections.defaultdict(int)
+        self._errors = collections.defaultdict(int)
+        self._latencies = collections.defaultdict(lambda: collections.deque(maxlen=LATENCY_WINDOW))
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Answer the requests of one (keep-alive) connection until it is closed."""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), IDLE_TIMEOUT)
+                except RequestError as error:
+                    writer.write(encode_response(error.status, {'error': str(error)}, False))
+                    break
+                if request is None:
+                    break
+
+                method, target, body, keep_alive = request
+                status, payload = await self.respond(method, target, body)
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception:  # pylint: disable=broad-except
+            # a bug must not drop the connection without an answer
+            traceback.print_exc()
+            writer.write(encode_response(500, {'error': 'internal error'}, False))
+        finally:
+            writer.close()
+
+    async def respond(self, method: str, target: str, body: bytes) -> Tuple[int, Any]:
+        """Return the status and (JSON-encodable, or already encoded) payload of a request."""
+        started = time.perf_counter()
+        path, _, query = target.partition('?')
+
+        if self._waiting >= MAX_WAITING_REQUESTS:
+            self._rejected += 1
+            return 503, {'error': 'too many requests'}
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        try:
+            status, payload = await self.route(method, path, query, body)
+        except RequestError as error:
+            status, payload = error.status, {'error': str(error)}
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            status, payload = 500, {'error': 'internal error'}
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+        # unknown paths share one entry, so the metrics stay bounded
+        endpoint = path if path in ENDPOINTS else 'other'
+        self._counts[endpoint] += 1
+        if status != 200:
+            self._errors[endpoint] += 1
+        self._latencies[endpoint].append(time.perf_counter() - started)
+
+        return status, payload
+
+    async def route(self, method: str, path: str, query: str, body: bytes) -> Tuple[int, Any]:
+        """Return the status and payload of the request for <path>."""
+        if path == '/batch':
+            if method != 'POST':
+                raise RequestError(405, 'use POST for /batch')
+            # a batch can take long enough to stall every other connection, so it runs on a
+            # worker thread, still holding its slot
+            return 200, await asyncio.get_running_loop().run_in_executor(None, self.batch, body)
+        elif method != 'GET':
+            raise RequestError(405, 'use GET for ' + path)
+        elif path == '/health':
+            return 200, {'status': 'ok'}
+        elif path == '/metrics':
+            return 200, self.metrics()
+        elif path in ('/sea-level', '/countries'):
+            year_input, co2_input = scenario_parameters(urllib.parse.parse_qs(query))
+            key = (path, year_input, co2_input)
+
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self._cache_hits += 1
+                return 200, cached
+            self._cache_misses += 1
+
+            if path == '/sea-level':
+                points = self.state.sea_level_points(year_input, co2_input)
+                payload = {'year': year_input, 'co2_per_year': co2_input,
+                           'sea_level_rise': points[-1] - points[0], 'sea_level_points': points}
+            else:
+                rise, land_loss, pop_displacement = await self.batcher.evaluate(year_input,
+                                                                                co2_input)
+                payload = {'year': year_input, 'co2_per_year': co2_input, 'sea_level_rise': rise,
+                           'land_loss': dict(zip(self.state.land_loss_table.codes.tolist(),
+                                                 land_loss)),
+                           'pop_displacement': dict(zip(
+                               self.state.pop_displacement_table.codes.tolist(),
+                               pop_displacement))}
+
+            encoded = json.dumps(payload, allow_nan=False).encode()
+            self._cache[key] = encoded
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            return 200, encoded
+        else:
+            raise RequestError(404, 'no endpoint ' + path)
+
+    def batch(self, body: bytes) -> bytes:
+        """Return the JSON-encoded sea level rise, land loss and population displacement of
+        every scenario listed in the JSON request <body>, evaluated together.
+        """
+        try:
+            scenarios = np.array(json.loads(body)['scenarios'], dtype=float).reshape((-1, 2))
+        except (ValueError, KeyError, TypeError):
+            raise RequestError(400, 'the body must be {"scenarios": [[year, co2], ...]}') from None
+        if len(scenarios) > MAX_BATCH_SCENARIOS:
+            raise RequestError(413, f'at most {MAX_BATCH_SCENARIOS} scenarios per request')
+        if not (np.all(np.isfinite(scenarios))
+                and np.all((scenarios[:, 0] > 2013) & (scenarios[:, 0] <= MAX_YEAR))
+                and np.all((scenarios[:, 1] >= 1) & (scenarios[:, 1] <= MAX_CO2_PER_YEAR))):
+            raise RequestError(400, f'every year must be after 2013 and at most {MAX_YEAR}, and '
+                                    f'every co2 at least 1 and at most {MAX_CO2_PER_YEAR:g}')
+
+        years = np.floor(scenarios[:, 0])
+        sea_level_rise, land_loss, pop_displacement = self.state.evaluate(years, scenarios[:, 1])
+
+        return json.dumps({
+            'scenarios': [[int(year), co2] for year, co2 in zip(years, scenarios[:, 1])],
+            'sea_level_rise': sea_level_rise.tolist(),
+            'land_loss_codes': self.state.land_loss_table.codes.tolist(),
+            'land_loss': land_loss.tolist(),
+            'pop_displacement_codes': self.state.pop_displacement_table.codes.tolist(),
+            'pop_displacement': pop_displacement.tolist()}, allow_nan=False).encode()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the request counts and latency percentiles (in ms) of every endpoint, and the
+        state of the cache, the batcher and the concurrency limit.
+        """
+        endpoints = {}
+        for path, latencies in self._latencies.items():
+            percentiles = np.percentile(np.array(latencies) * 1000, [50, 95, 99]).tolist()
+            endpoints[path] = {'requests': self._counts[path], 'errors': self._errors[path],
+                               'p50_ms': percentiles[0], 'p95_ms': percentiles[1],
+                               'p99_ms': percentiles[2], 'max_ms': max(latencies) * 1000}
+
+        return {'uptime_s': time.time() - self.started,
+                'endpoints': endpoints,
+                'cache': {'entries': len(self._cache), 'hits': self._cache_hits,
+                          'misses': self._cache_misses},
+                'batching': {'batches': self.batcher.batches,
+                             'scenarios': self.batcher.scenarios,
+                             'largest_batch': self.batcher.largest_batch},
+                'concurrency': {'in_flight': self._in_flight, 'waiting': self._waiting,
+                                'rejected': self._rejected}}
+
+
+def scenario_parameters(query: Dict[str, List[str]]) -> Tuple[int, float]:
+    """Return the (year, co2) scenario given by the parsed query string <query>.
+
+    >>> scenario_parameters({'year': ['2100'], 'co2': ['35000']})
+    (2100, 35000.0)
+    >>> scenario_parameters({'year': ['2100'], 'co2': ['inf']})  # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    RequestError: the year must be after 2013 and at most 10000, ...
+    """
+    try:
+        year_input = int(query['year'][0])
+        co2_input = float(query['co2'][0])
+    except (KeyError, ValueError):
+        raise RequestError(400, 'give the scenario as ?year=<int>&co2=<float>') from None
+
+    if not (2013 < year_input <= MAX_YEAR and np.isfinite(co2_input)
+            and 1 <= co2_input <= MAX_CO2_PER_YEAR):
+        raise RequestError(400, f'the year must be after 2013 and at most {MAX_YEAR}, and the '
+                                f'co2 at least 1 and at most {MAX_CO2_PER_YEAR:g}')
+
+    return year_input, co2_input
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes, bool]]:
+    """Return the (method, target, body, keep-alive) of the next HTTP request on <reader>, or
+    None when the connection was closed.
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+
+    try:
+        method, target, version = request_line.decode('latin-1').split()
+    except ValueError:
+        raise RequestError(400, 'malformed request line') from None
+
+    headers = {}
+    header_size = 0
+    while True:
+        try:
+            line = await reader.readline()
+        except ValueError:
+            # a line longer than the reader's buffer limit
+            raise RequestError(431, 'request headers too large') from None
+        if line in (b'\r\n', b'\n', b''):
+            break
+        header_size += len(line)
+        if len(headers) >= MAX_HEADER_COUNT or header_size > MAX_HEADER_SIZE:
+            raise RequestError(431, 'request headers too large')
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length', '0') or 0)
+    except ValueError:
+        raise RequestError(400, 'malformed Content-Length') from None
+    if length < 0:
+        raise RequestError(400, 'malformed Content-Length')
+    if length > MAX_BODY_SIZE:
+        raise RequestError(413, 'request body too large')
+    try:
+        body = await reader.readexactly(length) if length else b''
+    except asyncio.IncompleteReadError:
+        raise RequestError(400, 'request body shorter than its Content-Length') from None
+
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+
+    return method, target, body, keep_alive
+
+
+def encode_response(status: int, payload: Any, keep_alive: bool) -> bytes:
+    """Return the HTTP response with <status> and the JSON <payload> (or already encoded
+    JSON bytes).
+    """
+    body = payload if isinstance(payload, bytes) else json.dumps(payload, allow_nan=False).encode()
+    head = (f'HTTP/1.1 {status} {HTTP_REASONS.get(status, "")}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+
+    return head.encode('latin-1') + body
+
+
+async def serve(paths: List[str], host: str, port: int,
+                max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+                cache_size: int = RESPONSE_CACHE_SIZE,
+                batch_window: float = BATCH_WINDOW, curves: str = 'quadratic') -> None:
+    """Load the sea level, co2, land loss and population displacement datasets at <paths>
+    and answer requests on <host>:<port> until cancelled, with the country curves <curves>.
+    """
+    state = ModelState(*paths, curves)
+    service = PredictionService(state, max_concurrent, cache_size, batch_window)
+    server = await asyncio.start_server(service.handle_connection, host, port)
+
+    for socket in server.sockets:
+        address = socket.getsockname()
+        print(f'Serving predictions on http://{address[0]}:{address[1]}', flush=True)
+
+    async with server:
+        await server.serve_forever()
+
+
+def run(paths: List[str], host: str, port: int, max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+        cache_size: int = RESPONSE_CACHE_SIZE, batch_window: float = BATCH_WINDOW,
+        curves: str = 'quadratic') -> None:
+    """Run serve until interrupted with Ctrl+C."""
+    dataset_processing.clear_dataset_store()
+    try:
+        asyncio.run(serve(paths, host, port, max_concurrent, cache_size, batch_window, curves))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['asyncio', 'collections', 'json', 'time', 'traceback', 'urllib.parse',
+                          'typing', 'numpy', 'dataset_processing', 'prediction'],
+        'allowed-io': ['serve'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,207 @@
+"""CSC110 Fall 2020: service_test
+
+Module Description
+==================
+This module contains the tests of the local HTTP prediction service. Each test starts the
+service on 127.0.0.1 (on any free port) with the bundled sea level and co2 datasets and small
+country datasets, and sends it raw HTTP requests. Run them with python -m pytest service_test.py.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from typing import Any, List, Tuple
+
+import numpy as np
+import pytest
+
+import prediction
+import service
+
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Data', 'data')
+PATH_SEA_LEVEL = os.path.join(DATA_DIRECTORY, 'csiro_recons_gmsl_yr_2015_csv.csv')
+PATH_CO2 = os.path.join(DATA_DIRECTORY, 'annual-co2-emissions-per-country_sample.csv')
+
+
+@pytest.fixture
+def paths(tmp_path: Any) -> List[str]:
+    """Return the paths of the sea level, co2, land loss and population displacement datasets
+    the service is tested with.
+    """
+    country_paths = []
+    for name in ['land_loss.csv', 'pop_displacement.csv']:
+        path = os.path.join(str(tmp_path), name)
+        with open(path, 'w') as file:
+            file.write('Code,Country,1m,2m,3m,4m,5m\n'
+                       'ARG,Argentina,0.12,0.25,0.4,0.56,0.73\n'
+                       'BHS,Bahamas,5.06,11.3,19.1,26.0,32.3\n')
+        country_paths.append(path)
+
+    return [PATH_SEA_LEVEL, PATH_CO2] + country_paths
+
+
+async def request(port: int, raw: bytes) -> Tuple[int, Any]:
+    """Send the raw HTTP request <raw> to the service on <port>, and return the status and
+    decoded JSON body of its answer.
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(raw)
+    await writer.drain()
+    if raw.endswith(b'SHORT'):
+        # a client that closes before sending the whole body
+        writer.write_eof()
+    response = await reader.read()
+    writer.close()
+
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+def run_against_service(paths: List[str], requests: List[bytes]) -> List[Tuple[int, Any]]:
+    """Start the service on 127.0.0.1 with the datasets at <paths>, and return the answers to
+    <requests>, sent one after the other.
+    """
+    async def run() -> List[Tuple[int, Any]]:
+        predictor = service.PredictionService(service.ModelState(*paths))
+        server = await asyncio.start_server(predictor.handle_connection, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return [await request(port, raw) for raw in requests]
+
+    return asyncio.run(run())
+
+
+def get(target: str) -> bytes:
+    """Return the raw GET request of <target>."""
+    return f'GET {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode()
+
+
+def post(target: str, body: bytes, length: Any = None) -> bytes:
+    """Return the raw POST request of <body> to <target>, with the Content-Length <length>
+    (the length of <body> by default).
+    """
+    length = len(body) if length is None else length
+    return (f'POST {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n'
+            f'Content-Length: {length}\r\n\r\n').encode() + body
+
+
+def test_sea_level(paths: List[str]) -> None:
+    """Test that /sea-level gives the trajectory of prediction.sea_level_prediction."""
+    [(status, payload)] = run_against_service(paths, [get('/sea-level?year=2100&co2=35000')])
+    expected = prediction.sea_level_prediction(paths[0], paths[1], 87 * 35000.0, False, 87)
+
+    assert status == 200
+    assert np.allclose(payload['sea_level_points'], expected, rtol=1e-9)
+    assert payload['sea_level_rise'] == pytest.approx(expected[-1] - expected[0], rel=1e-9)
+
+
+def test_batch(paths: List[str]) -> None:
+    """Test that POST /batch gives the country stats of every scenario."""
+    body = json.dumps({'scenarios': [[2100, 35000], [2050, 1000]]}).encode()
+    [(status, payload)] = run_against_service(paths, [post('/batch', body)])
+
+    assert status == 200
+    assert payload['scenarios'] == [[2100, 35000.0], [2050, 1000.0]]
+    assert payload['land_loss_codes'] == ['ARG', 'BHS']
+    assert np.array(payload['land_loss']).shape == (2, 2)
+    assert payload['sea_level_rise'][0] > payload['sea_level_rise'][1] > 0
+
+
+def test_bad_requests(paths: List[str]) -> None:
+    """Test that invalid scenarios and malformed requests are answered with 400."""
+    answers = run_against_service(paths, [
+        get('/sea-level?year=2100&co2=inf'),
+        get('/sea-level?year=1000000000&co2=35000'),
+        post('/batch', b'{"scenarios": [[1e400, 5]]}'),
+        post('/batch', b'{"scenarios": 3}'),
+        post('/batch', b'{}', 'abc'),
+        post('/batch', b'{}', -1),
+        post('/batch', b'SHORT', 100)])
+
+    assert [status for status, _ in answers] == [400] * 7
+    assert all('error' in payload for _, payload in answers)
+
+
+def test_too_large(paths: List[str]) -> None:
+    """Test that too large bodies and batches are answered with 413."""
+    scenarios = json.dumps({'scenarios': [[2100, 1]] * (service.MAX_BATCH_SCENARIOS + 1)})
+    answers = run_against_service(paths, [
+        post('/batch', b'{}', service.MAX_BODY_SIZE + 1),
+        post('/batch', scenarios.encode())])
+
+    assert [status for status, _ in answers] == [413, 413]
+
+
+
+def test_too_many_headers(paths: List[str]) -> None:
+    """Test that requests with too many or too large headers are answered with 431."""
+    many_headers = ''.join(f'X-Header-{i}: {i}\r\n' for i in range(service.MAX_HEADER_COUNT + 1))
+    answers = run_against_service(paths, [
+        f'GET /health HTTP/1.1\r\n{many_headers}\r\n'.encode(),
+        f'GET /health HTTP/1.1\r\nX-Large: {"a" * service.MAX_HEADER_SIZE}\r\n\r\n'.encode(),
+        f'GET /health HTTP/1.1\r\nX-Huge: {"a" * (1 << 17)}\r\n\r\n'.encode()])
+
+    assert [status for status, _ in answers] == [431, 431, 431]
+
+
+def test_batch_does_not_block_other_requests(paths: List[str]) -> None:
+    """Test that other requests are answered while a slow /batch request is evaluated."""
+    answers = []
+
+    def check_health(port: int) -> None:
+        """Send GET /health to the service on <port> from this thread, and record the response
+        and how long it took.
+        """
+        time.sleep(0.2)
+        started = time.perf_counter()
+        with socket.create_connection(('127.0.0.1', port)) as connection:
+            connection.sendall(get('/health'))
+            response = b''.join(iter(lambda: connection.recv(65536), b''))
+        answers.append((response, time.perf_counter() - started))
+
+    async def run() -> None:
+        predictor = service.PredictionService(service.ModelState(*paths))
+        evaluate = predictor.state.evaluate
+
+        def slow_evaluate(years: np.ndarray, co2_per_year: np.ndarray) -> Any:
+            time.sleep(1.0)
+            return evaluate(years, co2_per_year)
+
+        predictor.state.evaluate = slow_evaluate
+        server = await asyncio.start_server(predictor.handle_connection, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            health = threading.Thread(target=check_health, args=(port,))
+            health.start()
+            status, _ = await request(port, post('/batch', b'{"scenarios": [[2100, 35000]]}'))
+            assert status == 200
+            await asyncio.to_thread(health.join)
+
+    asyncio.run(run())
+    [(response, latency)] = answers
+    assert response.startswith(b'HTTP/1.1 200') and latency < 0.5
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['asyncio', 'json', 'os', 'socket', 'threading', 'time', 'typing',
+                          'numpy', 'pytest', 'prediction', 'service'],
+        'allowed-io': ['paths'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
@@ -0,0 +1,734 @@
+"""CSC110 Fall 2020: slr
+
+Module Description
+==================
+This module contains the command line interface to the prediction system, for running
+it without the GUI. Run it with python -m slr <command>; the available commands are:
+
+    batch   Predict every scenario of a (target year, co2 per year) grid and write the
+            results to a CSV or Parquet file, e.g.
+            python -m slr batch --grid years=2020:2200:5 co2=1000:80000:500 -o sweep.csv
+            With --curves bounded, the country curves are monotone and capped at 100%.
+            With --store results.sqlite, the results are saved to a result store instead
+            (skipping the scenarios already stored), and --trajectories adds the sea level
+            trajectories.
+    query   Write the scenarios of a result store whose sea level rise (in mm) is in a range,
+            in the columns of batch, e.g.
+            python -m slr query results.sqlite --rise 500 800
+    render  Write the figures the GUI shows for every scenario of a grid to static HTML
+            (and PNG) files sharing one plotly.js bundle, e.g.
+            python -m slr render --grid years=2050:2150:50 co2=35000 -o report --format html
+            With --compare, only two maps (land loss and population displaced) are written,
+            each with a slider over every scenario of the grid.
+    uncertainty
+            Write the percentile bands of the sea level trajectory, its rise and every country's
+            land loss and population displacement for one scenario, by Monte Carlo over the
+            sea level dataset's uncertainty, e.g.
+            python -m slr uncertainty --year 2100 --co2-per-year 35000 --draws 10000 -o bands.csv
+    ingest  Parse the raw slr-impacts workbook (or a CSV export of it) into the cache, and
+            write the land_loss.csv and pop_displacement.csv datasets the predictions use, e.g.
+            python -m slr ingest Data/data/slr-impacts_nov2010.xls -o "Project Datasets"
+    aggregate
+            Write the sq. km of land lost and the people displaced in every scenario of a grid,
+            summed by region and for the world (and per country with --countries), using the
+            country areas and populations of the slr-impacts workbook, e.g.
+            python -m slr aggregate --grid years=2100:2500:100 co2=35000 --curves bounded
+    select  Choose each country's impact model (polynomial, piecewise-linear, monotone spline or
+            log-linear) by leave-one-out cross-validation, cache the choices and write them as
+            CSV, e.g.
+            python -m slr select --workers 4 -o models.csv
+            batch --curves selected then predicts with the chosen models.
+    serve   Answer sea level and national stats queries over HTTP on localhost, from models
+            fitted once at startup (see the service module for the endpoints), e.g.
+            python -m slr serve --port 8110
+            With --curves bounded, the country curves are monotone and capped at 100%.
+
+python slr.py python_ta checks this module with python_ta instead.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of TAs and instructors
+involved with CSC110 at the University of Toronto St. George campus. All forms of
+distribution of this code, whether as given or with any changes, are
+expressly prohibited.
+
+This file is Copyright (c) 2020 Jason Wang, Kevin Wang, Samraj Aneja and Abdus Shaikh.
+"""
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+PATH_SEA_LEVEL = 'Project Datasets/csiro_recons_gmsl_yr_2015_csv.csv'
+PATH_CO2 = 'Project Datasets/annual-co2-emissions-per-country_1.csv'
+PATH_LAND_LOSS = 'Project Datasets/land_loss.csv'
+PATH_POP_DISPLACEMENT = 'Project Datasets/pop_displacement.csv'
+PATH_COUNTRY_TO_CODE = 'Project Datasets/Country_to_Code.csv'
+PATH_IMPACTS = 'Data/data/slr-impacts_nov2010.xls'
+
+# number of scenarios handed to a worker process at a time
+CHUNK_SIZE = 4096
+
+# names of the grid axes accepted by --grid
+GRID_AXES = ['years', 'co2']
+
+# dataset paths used by the scenarios run in this (worker) process, and the country curves
+# (one of prediction.IMPACT_CURVES) they use, set by init_worker
+_worker_paths: List[str] = []
+_worker_curves = 'quadratic'
+
+
+def parse_grid_axis(spec: str) -> Tuple[str, List[float]]:
+    """Return the name and values of a grid axis given as name=start:stop:step, where stop is
+    included, or as name=value.
+
+    >>> parse_grid_axis('years=2020:2030:5')
+    ('years', [2020.0, 2025.0, 2030.0])
+    >>> parse_grid_axis('co2=35000')
+    ('co2', [35000.0])
+    """
+    name, _, bounds = spec.partition('=')
+    if name not in GRID_AXES or not bounds:
+        raise ValueError('grid axes are given as ' + '|'.join(GRID_AXES)
+                         + '=start:stop:step, not ' + repr(spec))
+
+    parts = [float(part) for part in bounds.split(':')]
+    if len(parts) == 1:
+        return name, parts
+    elif len(parts) == 3 and parts[2] > 0:
+        start, stop, step = parts
+        count = int((stop - start) / step + 1e-9) + 1
+        return name, [start + i * step for i in range(max(count, 0))]
+    else:
+        raise ValueError('grid axes are given as ' + '|'.join(GRID_AXES)
+                         + '=start:stop:step, not ' + repr(spec))
+
+
+def scenario_grid(axes: Dict[str, List[float]]) -> Iterator[Tuple[int, float]]:
+    """Yield every (target year, co2 per year) scenario of the grid <axes>, skipping the
+    scenarios the GUI would reject as invalid input.
+    """
+    for year_input, co2_input in itertools.product(axes['years'], axes['co2']):
+        if year_input > 2013 and co2_input >= 1:
+            yield int(year_input), co2_input
+
+
+def chunked(scenarios: Iterator[Tuple[int, float]],
+            chunk_size: int) -> Iterator[List[Tuple[int, float]]]:
+    """Yield consecutive lists of at most <chunk_size> scenarios from <scenarios>."""
+    while True:
+        chunk = list(itertools.islice(scenarios, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def init_worker(paths: List[str], curves: str = 'quadratic') -> None:
+    """Set the dataset paths and country curves of this worker process and load every dataset
+    once, so that each chunk only computes predictions.
+    """
+    import prediction
+
+    global _worker_curves
+    _worker_paths[:] = paths
+    _worker_curves = curves
+    prediction.evaluate_grid(np.array([2014]), np.array([1.0]), *paths, curves)
+
+
+def run_chunk(chunk: List[Tuple[int, float]]) -> np.ndarray:
+    """Return one result row per scenario of <chunk>: the target year, co2 per year,
+    sea level rise, then the national land loss and population displacement percentages.
+
+    The whole chunk is evaluated at once with prediction.evaluate_grid.
+    """
+    import prediction
+
+    years, co2_per_year = np.array(chunk, dtype=float).T
+    grid = prediction.evaluate_grid(years, co2_per_year, *_worker_paths, _worker_curves)
+
+    return np.column_stack([years, co2_per_year, grid.sea_level_rise,
+                            grid.land_loss, grid.pop_displacement])
+
+
+def run_csv_chunk(chunk: List[Tuple[int, float]]) -> str:
+    """Return the rows of run_chunk(chunk) as CSV text, so that formatting, which costs more
+    than the predictions themselves, is spread over the worker processes.
+    """
+    rows = run_chunk(chunk).tolist()
+
+    return ''.join(str(int(row[0])) + ',' + ','.join(map(repr, row[1:])) + '\r\n' for row in rows)
+
+
+def result_columns(paths: List[str]) -> List[str]:
+    """Return the column names of the rows returned by run_chunk."""
+    import prediction
+
+    land_loss_codes = prediction.land_loss_coefficients(paths[2]).codes
+    pop_displacement_codes = prediction.pop_displacement_coefficients(paths[3]).codes
+
+    return (['year', 'co2_per_year', 'sea_level_rise']
+            + ['land_loss_' + code for code in land_loss_codes]
+            + ['pop_displacement_' + code for code in pop_displacement_codes])
+
+
+class ResultWriter:
+    """Stream result rows to a CSV file, or to a Parquet file if the output path ends in
+    .parquet (which needs pyarrow).
+
+    Instance Attributes:
+      - rows_written: the number of rows written so far
+    """
+    rows_written: int
+    _columns: List[str]
+    _file: Any
+    _writer: Any
+
+    def __init__(self, output: str, columns: List[str]) -> None:
+        self.rows_written = 0
+        self._columns = columns
+
+        if output.endswith('.parquet'):
+            import pyarrow
+            import pyarrow.parquet
+
+            schema = pyarrow.schema([(column, pyarrow.int64() if column == 'year'
+                                      else pyarrow.float64()) for column in columns])
+            self._file = None
+            self._writer = pyarrow.parquet.ParquetWriter(output, schema)
+        else:
+            self._file = sys.stdout if output == '-' else open(output, 'w', newline='')
+            self._writer = None
+            csv.writer(self._file).writerow(columns)
+
+    def write(self, rows: Any) -> None:
+        """Append <rows> to the output: an array from run_chunk if writing Parquet, or the
+        CSV text from run_csv_chunk otherwise.
+        """
+        if self._file is None:
+            import pyarrow
+
+            self._writer.write_table(pyarrow.table(
+                [rows[:, 0].astype(np.int64)] + [rows[:, i] for i in range(1, rows.shape[1])],
+                schema=self._writer.schema))
+            self.rows_written += len(rows)
+        else:
+            self._file.write(rows)
+            self.rows_written += rows.count('\n')
+
+    def close(self) -> None:
+        """Finish writing the output."""
+        if self._file is None:
+            self._writer.close()
+        elif self._file is not sys.stdout:
+            self._file.close()
+
+
+class StoreWriter:
+    """Save result rows (arrays from run_chunk) to a result_store.ResultStore, with the same
+    interface as ResultWriter.
+
+    Instance Attributes:
+      - rows_written: the number of rows written so far
+    """
+    rows_written: int
+    _store: Any
+    _key: Any
+    _paths: List[str]
+    _codes: Tuple[List[str], List[str]]
+    _trajectories: bool
+
+    def __init__(self, store: Any, key: Any, paths: List[str], trajectories: bool) -> None:
+        import prediction
+
+        self.rows_written = 0
+        self._store = store
+        self._key = key
+        self._paths = paths
+        self._codes = (prediction.land_loss_coefficients(paths[2]).codes.tolist(),
+                       prediction.pop_displacement_coefficients(paths[3]).codes.tolist())
+        self._trajectories = trajectories
+
+    def write(self, rows: np.ndarray) -> None:
+        """Save the results in <rows> to the store, with their sea level trajectories if
+        this writer stores them.
+        """
+        import prediction
+
+        split = 3 + len(self._codes[0])
+        trajectories = None
+        if self._trajectories:
+            trajectories = prediction.sea_level_trajectories(self._paths[0], self._paths[1],
+                                                             rows[:, 0], rows[:, 1])
+
+        self._store.put(self._key, rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3:split],
+                        rows[:, split:], *self._codes, trajectories)
+        self.rows_written += len(rows)
+
+    def close(self) -> None:
+        """Close the store."""
+        self._store.close()
+
+
+def unstored_chunks(chunks: Iterator[List[Tuple[int, float]]], store: Any,
+                    key: Any) -> Iterator[List[Tuple[int, float]]]:
+    """Yield the scenarios of each chunk of <chunks> not stored under <key> in <store>,
+    skipping chunks that are fully stored.
+    """
+    for chunk in chunks:
+        stored = store.stored(key, chunk)
+        missing = [scenario for scenario in chunk if scenario not in stored]
+        if missing:
+            yield missing
+
+
+def run_batch(axes: Dict[str, List[float]], paths: List[str], output: str,
+              workers: Optional[int], chunk_size: int, curves: str = 'quadratic',
+              store: Optional[str] = None, trajectories: bool = False) -> int:
+    """Predict every scenario of the grid <axes> on a pool of <workers> processes, and stream
+    the results to <output> as chunks finish (so rows are not in grid order).
+    <curves> picks the country curves, as in prediction.evaluate_grid.
+
+    With a <store> path, the results are saved to that result store instead of <output>,
+    with their sea level trajectories if <trajectories>, and the scenarios already stored for
+    the same model and datasets are skipped.
+    Return the number of scenarios written.
+    """
+    chunks = chunked(scenario_grid(axes), chunk_size)
+    if store is None:
+        writer = ResultWriter(output, result_columns(paths))
+        arrays = output.endswith('.parquet')
+    else:
+        import result_store
+
+        key = result_store.store_key(paths, curves)
+        result_store_ = result_store.ResultStore(store)
+        writer = StoreWriter(result_store_, key, paths, trajectories)
+        chunks = unstored_chunks(chunks, result_store_, key)
+        arrays = True
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(paths, curves)) as executor:
+        # keep a bounded number of chunks in flight, so huge grids are never held in memory
+        max_in_flight = 4 * workers
+        in_flight: Set[Future] = set()
+
+        for chunk in itertools.chain(chunks, [None]):
+            if chunk is not None:
+                in_flight.add(executor.submit(run_chunk if arrays else run_csv_chunk, chunk))
+            while in_flight and (chunk is None or len(in_flight) >= max_in_flight):
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    writer.write(future.result())
+                print(f'\r{writer.rows_written} scenarios in {time.perf_counter() - started:.1f} s',
+                      end='', file=sys.stderr)
+
+    writer.close()
+    print(file=sys.stderr)
+
+    return writer.rows_written
+
+
+def run_render(axes: Dict[str, List[float]], paths: List[str], filepath_country_to_code: str,
+               output_directory: str, formats: Tuple[str, ...], compare: bool) -> str:
+    """Render the figures of every scenario of the grid <axes> into <output_directory> through
+    one rendering.FigureRenderer, and return its size and render time summary.
+    If <compare> is True, only the two maps comparing every scenario are rendered.
+    """
+    import rendering
+
+    scenarios = list(scenario_grid(axes))
+    with rendering.FigureRenderer(output_directory) as renderer:
+        if compare and scenarios:
+            rendering.render_scenario_comparison(renderer, paths, filepath_country_to_code,
+                                                 scenarios, formats)
+        else:
+            for year_input, co2_input in scenarios:
+                rendering.render_scenario(renderer, paths, filepath_country_to_code,
+                                          year_input, co2_input, formats)
+
+    return renderer.summary()
+
+
+def run_uncertainty(paths: List[str], year_input: int, co2_input: float, draws: int,
+                    percentiles: List[float], seed: int, workers: int, output: str) -> None:
+    """Write the percentile bands of prediction.uncertainty_prediction for the scenario
+    (<year_input>, <co2_input>) to <output> as CSV, one row per quantity and point or country.
+    """
+    import prediction
+
+    result = prediction.uncertainty_prediction(*paths, year_input, co2_input, draws, percentiles,
+                                               seed, workers)
+
+    rows = [['sea_level_rise', ''] + result.sea_level_rise.tolist()]
+    rows += [['sea_level', str(2014 + i)] + band
+             for i, band in enumerate(result.sea_level_points.T.tolist())]
+    rows += [['land_loss', code] + band
+             for code, band in zip(result.land_loss_codes, result.land_loss.T.tolist())]
+    rows += [['pop_displacement', code] + band
+             for code, band in zip(result.pop_displacement_codes,
+                                   result.pop_displacement.T.tolist())]
+
+    file = sys.stdout if output == '-' else open(output, 'w', newline='')
+    writer = csv.writer(file)
+    writer.writerow(['quantity', 'point'] + [f'p{percentile:g}' for percentile in percentiles])
+    writer.writerows(rows)
+    if file is not sys.stdout:
+        file.close()
+
+
+def run_aggregate(axes: Dict[str, List[float]], paths: List[str], filepath_impacts: str,
+                  curves: str, countries: bool, output: str, chunk_size: int) -> int:
+    """Write the absolute land loss (sq. km) and population displacement (people) of every
+    scenario of the grid <axes> to <output> as CSV, by region and for the world, and by country
+    if <countries>. Return the number of scenarios written.
+
+    Each chunk of <chunk_size> scenarios is predicted with prediction.evaluate_grid and
+    aggregated in one pass with aggregation.aggregate.
+    """
+    import aggregation
+    import prediction
+
+    file = sys.stdout if output == '-' else open(output, 'w', newline='')
+    writer = csv.writer(file)
+    # mapping from quantity to the region index of its countries, built with the first chunk
+    indexes = {}
+    written = 0
+
+    for chunk in chunked(scenario_grid(axes), chunk_size):
+        years, co2_per_year = np.array(chunk, dtype=float).T
+        grid = prediction.evaluate_grid(years, co2_per_year, *paths, curves)
+        if not indexes:
+            indexes['land_loss_km2'] = aggregation.impacts_index(
+                filepath_impacts, aggregation.LAND_SHEET, grid.land_loss_codes)
+            indexes['pop_displaced'] = aggregation.impacts_index(
+                filepath_impacts, aggregation.POPULATION_SHEET, grid.pop_displacement_codes)
+            for quantity, index in indexes.items():
+                if index.missing:
+                    print(f'{quantity}: no totals for ' + ', '.join(index.missing)
+                          + ', counted as 0', file=sys.stderr)
+            writer.writerow(['year', 'co2_per_year', 'quantity', 'level', 'name', 'value'])
+
+        for quantity, percentages in [('land_loss_km2', grid.land_loss),
+                                      ('pop_displaced', grid.pop_displacement)]:
+            impacts = aggregation.aggregate(indexes[quantity], percentages)
+            for i, (year_input, co2_input) in enumerate(chunk):
+                writer.writerow([year_input, co2_input, quantity, 'world', 'World',
+                                 impacts.world[i]])
+                writer.writerows([year_input, co2_input, quantity, 'region', name, value]
+                                 for name, value in zip(impacts.region_names.tolist(),
+                                                        impacts.regions[i].tolist()))
+                if countries:
+                    writer.writerows([year_input, co2_input, quantity, 'country', code, value]
+                                     for code, value in zip(impacts.codes.tolist(),
+                                                            impacts.countries[i].tolist()))
+        written += len(chunk)
+
+    if file is not sys.stdout:
+        file.close()
+
+    return written
+
+
+def run_select(paths: List[str], workers: int, output: str) -> None:
+    """Choose the model of every country of the land loss and population displacement datasets
+    in <paths> by cross-validation on <workers> processes, cache the choices, and write them to
+    <output> as CSV: one row per dataset and country, with its model and the leave-one-out error
+    of every candidate.
+    """
+    import dataset_processing
+    import prediction
+
+    file = sys.stdout if output == '-' else open(output, 'w', newline='')
+    writer = csv.writer(file)
+    header = None
+
+    for quantity, path, loader in [('land_loss', paths[2], dataset_processing.process_land_loss),
+                                   ('pop_displacement', paths[3],
+                                    dataset_processing.process_pop_displacement)]:
+        selection = prediction.build_model_selection(path, loader, workers)
+        if header is None:
+            header = ['quantity', 'code', 'model'] + ['loo_rmse_' + str(name)
+                                                      for name in selection.names]
+            writer.writerow(header)
+        for code, choice, scores in zip(selection.codes, selection.choices,
+                                        selection.scores.tolist()):
+            writer.writerow([quantity, code, selection.names[choice]] + scores)
+
+    if file is not sys.stdout:
+        file.close()
+
+
+def run_query(paths: List[str], store: str, curves: str, low: float, high: float,
+              limit: Optional[int], output: str) -> int:
+    """Write the scenarios of the result store at <store> computed from the datasets in <paths>
+    with the country curves <curves>, whose sea level rise is between <low> and <high> mm, to
+    <output> as CSV in the columns of run_batch, at most <limit> of them in increasing order of
+    rise. Return the number of scenarios written.
+    """
+    import result_store
+
+    key = result_store.store_key(paths, curves)
+    file = sys.stdout if output == '-' else open(output, 'w', newline='')
+    writer = csv.writer(file)
+    written = 0
+
+    with result_store.ResultStore(store) as results:
+        if results.count(key) > 0:
+            for scenario in results.query_rise(key, low, high, limit):
+                if written == 0:
+                    writer.writerow(['year', 'co2_per_year', 'sea_level_rise']
+                                    + ['land_loss_' + code for code in scenario.land_loss_codes]
+                                    + ['pop_displacement_' + code
+                                       for code in scenario.pop_displacement_codes])
+                writer.writerow([scenario.year, scenario.co2_per_year, scenario.sea_level_rise]
+                                + scenario.land_loss.tolist()
+                                + scenario.pop_displacement.tolist())
+                written += 1
+
+    if file is not sys.stdout:
+        file.close()
+
+    return written
+
+
+def run_ingest(filepath_impacts: str, output_directory: str) -> str:
+    """Write the land loss and population displacement datasets of the slr-impacts dataset at
+    <filepath_impacts> into <output_directory>, and return a description of what was ingested.
+    """
+    import dataset_processing
+
+    tables = dataset_processing.load_impacts(filepath_impacts)
+    os.makedirs(output_directory, exist_ok=True)
+
+    lines = []
+    for sheet, filename in [('Land', 'land_loss.csv'), ('Population', 'pop_displacement.csv')]:
+        if sheet in tables and len(tables[sheet].codes) > 0:
+            path = os.path.join(output_directory, filename)
+            dataset_processing.write_impact_percentages(tables[sheet], path)
+            lines.append(f'{path}: {len(tables[sheet].codes)} countries')
+        else:
+            lines.append(f'{filename}: no {sheet} section with countries, not written')
+    lines.append('cached sheets: ' + ', '.join(tables))
+
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command given by <argv> (sys.argv[1:] by default) and return its exit status."""
+    parser = argparse.ArgumentParser(prog='python -m slr', description='Sea level rise predictions '
+                                     'without the GUI.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch = commands.add_parser('batch', help='predict a grid of scenarios without plotting')
+    batch.add_argument('--grid', nargs='+', required=True, metavar='AXIS=START:STOP:STEP',
+                       help='the target years and co2 emissions per year (metric tonnes) to sweep, '
+                            'e.g. years=2020:2200:5 co2=1000:80000:500')
+    batch.add_argument('-o', '--output', default='-',
+                       help='CSV file to write (or .parquet file, which needs pyarrow); '
+                            'standard output by default')
+    batch.add_argument('--workers', type=int, default=None,
+                       help='number of worker processes (one per CPU by default)')
+    batch.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                       help='scenarios per unit of work handed to a worker')
+    batch.add_argument('--curves', default='quadratic',
+                       choices=['quadratic', 'selected', 'bounded'],
+                       help='country impact curves: the quadratic fits (default), the models '
+                            'chosen by the select command, or monotone curves capped at 100%%')
+    batch.add_argument('--store', default=None, metavar='FILE',
+                       help='SQLite result store to save the results to instead of --output, '
+                            'skipping the scenarios it already holds')
+    batch.add_argument('--trajectories', action='store_true',
+                       help='also store the sea level trajectory of every scenario')
+    render = commands.add_parser('render', help='write the figures of a grid of scenarios to '
+                                 'static files')
+    render.add_argument('--grid', nargs='+', required=True, metavar='AXIS=START:STOP:STEP',
+                        help='the target years and co2 emissions per year (metric tonnes) to '
+                             'render, e.g. years=2050:2150:50 co2=35000')
+    render.add_argument('-o', '--output', required=True, help='directory to write the files to')
+    render.add_argument('--format', nargs='+', default=['html'], choices=['html', 'png'],
+                        help='file formats to write (png needs kaleido)')
+    render.add_argument('--compare', action='store_true',
+                        help='write one land loss and one population map with a slider over the '
+                             'scenarios instead of the figures of each scenario')
+    render.add_argument('--country-to-code', default=PATH_COUNTRY_TO_CODE)
+
+    uncertainty = commands.add_parser('uncertainty', help='percentile bands of one scenario')
+    uncertainty.add_argument('--year', type=int, required=True, help='target year (after 2013)')
+    uncertainty.add_argument('--co2-per-year', type=float, required=True,
+                             help='co2 emissions per year in metric tonnes (at least 1)')
+    uncertainty.add_argument('--draws', type=int, default=10000,
+                             help='perturbed sea level series to fit')
+    uncertainty.add_argument('--percentiles', nargs='+', type=float, default=[5.0, 50.0, 95.0])
+    uncertainty.add_argument('--seed', type=int, default=0)
+    uncertainty.add_argument('--workers', type=int, default=1,
+                             help='number of processes to spread the draws over')
+    uncertainty.add_argument('-o', '--output', default='-',
+                             help='CSV file to write; standard output by default')
+
+    ingest = commands.add_parser('ingest', help='normalize the raw slr-impacts dataset')
+    ingest.add_argument('impacts', nargs='?', default=PATH_IMPACTS,
+                        help='the slr-impacts .xls workbook (needs xlrd) or a CSV export of it')
+    ingest.add_argument('-o', '--output', default=os.path.dirname(PATH_LAND_LOSS),
+                        help='directory to write land_loss.csv and pop_displacement.csv to')
+
+    aggregate = commands.add_parser('aggregate', help='absolute impacts of a grid of scenarios '
+                                    'by region and for the world')
+    aggregate.add_argument('--grid', nargs='+', required=True, metavar='AXIS=START:STOP:STEP',
+                           help='the target years and co2 emissions per year (metric tonnes) to '
+                                'predict, e.g. years=2050:2150:50 co2=35000')
+    aggregate.add_argument('--impacts', default=PATH_IMPACTS,
+                           help='the slr-impacts workbook (needs xlrd) or a CSV export of it, '
+                                'with the country areas and populations')
+    aggregate.add_argument('--curves', default='quadratic',
+                           choices=['quadratic', 'selected', 'bounded'],
+                           help='country impact curves, as for batch')
+    aggregate.add_argument('--countries', action='store_true',
+                           help='also write every country\'s impacts')
+    aggregate.add_argument('-o', '--output', default='-',
+                           help='CSV file to write; standard output by default')
+    aggregate.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                           help='scenarios predicted and aggregated at a time')
+
+    select = commands.add_parser('select', help='cross-validate the country impact models')
+    select.add_argument('--workers', type=int, default=1,
+                        help='number of processes to spread the cross-validation over')
+    select.add_argument('-o', '--output', default='-',
+                        help='CSV file to write; standard output by default')
+
+    query = commands.add_parser('query', help='scenarios of a result store by sea level rise')
+    query.add_argument('store', help='the SQLite result store written by batch --store')
+    query.add_argument('--rise', nargs=2, type=float, required=True, metavar=('LOW', 'HIGH'),
+                       help='range of sea level rise in mm, e.g. --rise 500 800')
+    query.add_argument('--curves', default='quadratic',
+                       choices=['quadratic', 'selected', 'bounded'],
+                       help='country impact curves the results were computed with')
+    query.add_argument('--limit', type=int, default=None, help='scenarios to write at most')
+    query.add_argument('-o', '--output', default='-',
+                       help='CSV file to write; standard output by default')
+
+    serve = commands.add_parser('serve', help='answer prediction queries over HTTP')
+    serve.add_argument('--host', default='127.0.0.1',
+                       help='address to listen on; localhost only by default')
+    serve.add_argument('--port', type=int, default=8110, help='port to listen on (0 for any)')
+    serve.add_argument('--max-concurrent', type=int, default=32,
+                       help='requests handled at once')
+    serve.add_argument('--cache-size', type=int, default=1024, help='responses kept cached')
+    serve.add_argument('--batch-window', type=float, default=2.0,
+                       help='milliseconds a /countries request waits to be batched with others')
+    serve.add_argument('--curves', default='quadratic',
+                       choices=['quadratic', 'selected', 'bounded'],
+                       help='country impact curves, as for batch')
+
+    for command in [batch, render, uncertainty, aggregate, select, query, serve]:
+        command.add_argument('--sea-level', default=PATH_SEA_LEVEL)
+        command.add_argument('--co2', default=PATH_CO2)
+        command.add_argument('--land-loss', default=PATH_LAND_LOSS)
+        command.add_argument('--pop-displacement', default=PATH_POP_DISPLACEMENT)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'ingest':
+        try:
+            print(run_ingest(args.impacts, args.output))
+        except (ImportError, ValueError) as error:
+            parser.error(str(error))
+        return 0
+
+    paths = [os.path.abspath(path) for path in
+             [args.sea_level, args.co2, args.land_loss, args.pop_displacement]]
+
+    if args.command == 'select':
+        run_select(paths, args.workers, args.output)
+        return 0
+
+    if args.command == 'query':
+        if not os.path.exists(args.store):
+            parser.error(f'{args.store} does not exist')
+        print(f'{run_query(paths, args.store, args.curves, *args.rise, args.limit, args.output)} '
+              'scenarios', file=sys.stderr)
+        return 0
+
+    if args.command == 'serve':
+        import service
+
+        if args.max_concurrent < 1 or args.cache_size < 0 or args.batch_window < 0:
+            parser.error('--max-concurrent must be at least 1, and --cache-size and '
+                         '--batch-window at least 0')
+        service.run(paths, args.host, args.port, args.max_concurrent, args.cache_size,
+                    args.batch_window / 1000, args.curves)
+        return 0
+
+    if args.command == 'uncertainty':
+        if args.year <= 2013 or args.co2_per_year < 1 or args.draws < 1:
+            parser.error('the year must be after 2013, the co2 per year at least 1 and the '
+                         'draws at least 1')
+        run_uncertainty(paths, args.year, args.co2_per_year, args.draws, args.percentiles,
+                        args.seed, args.workers, args.output)
+        return 0
+
+    try:
+        axes = dict(parse_grid_axis(spec) for spec in args.grid)
+    except ValueError as error:
+        parser.error(str(error))
+    missing = [axis for axis in GRID_AXES if axis not in axes]
+    if missing:
+        parser.error('--grid is missing ' + ', '.join(missing))
+
+    if args.command == 'batch':
+        if args.output.endswith('.parquet'):
+            try:
+                import pyarrow
+            except ImportError:
+                parser.error('writing Parquet files needs pyarrow (pip install pyarrow)')
+
+        if args.trajectories and args.store is None:
+            parser.error('--trajectories needs --store')
+        run_batch(axes, paths, args.output, args.workers, args.chunk_size,
+                  args.curves, args.store, args.trajectories)
+    elif args.command == 'aggregate':
+        try:
+            run_aggregate(axes, paths, args.impacts, args.curves, args.countries, args.output,
+                          args.chunk_size)
+        except (ImportError, ValueError) as error:
+            parser.error(str(error))
+        except KeyError as error:
+            parser.error(f'{args.impacts} has no {error} section')
+    else:
+        if 'png' in args.format:
+            try:
+                import kaleido
+            except ImportError:
+                parser.error('writing PNG files needs kaleido (pip install kaleido)')
+
+        print(run_render(axes, paths, args.country_to_code, args.output, tuple(args.format),
+                         args.compare))
+
+    return 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['python_ta']:
+        import python_ta
+
+        python_ta.check_all(config={
+            'extra-imports': ['argparse', 'csv', 'itertools', 'os', 'sys', 'time',
+                              'concurrent.futures', 'typing', 'numpy', 'pyarrow',
+                              'pyarrow.parquet', 'kaleido', 'aggregation', 'dataset_processing',
+                              'prediction', 'rendering', 'result_store', 'service'],
+            'allowed-io': ['ResultWriter.__init__', 'run_batch', 'run_uncertainty',
+                           'run_aggregate', 'run_select', 'run_query', 'main'],
+            'max-line-length': 100,
+            'disable': ['R1705', 'C0200', 'C0415']
+        })
+    else:
+        sys.exit(main())